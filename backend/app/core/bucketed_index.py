@@ -0,0 +1,136 @@
+import datetime
+from app.core import sharding
+from app.core.constants import INDEX_BUCKET_SECONDS, INDEX_BUCKET_SCAN_BATCH
+from app.core.redis_clients import redis_client
+
+# The task index split into one sorted set per INDEX_BUCKET_SECONDS of
+# created_at, each placed on a shard by its bucket number. The directory of
+# buckets lives on the main node. Writes to new tasks only touch the newest
+# bucket, and older pages are read from whichever shards hold their buckets.
+DIR_KEY = "tasks_buckets"
+DIR_REBUILD_KEY = "tasks_buckets:rebuild"
+
+def _key(bucket: int) -> str:
+    # The hash tag keeps the scratch key used by rebuild() on the same node
+    return f"tasks_sorted:{{{bucket}}}"
+
+def _bucket_of(ts: float) -> int:
+    return int(ts // INDEX_BUCKET_SECONDS)
+
+def exists() -> bool:
+    return bool(redis_client.exists(DIR_KEY))
+
+def add(pipe: sharding.ShardedPipeline, task_id: int, created_at: datetime.datetime):
+    ts = created_at.timestamp()
+    bucket = _bucket_of(ts)
+    pipe.for_key(_key(bucket)).zadd(_key(bucket), {task_id: ts})
+    pipe.home().zadd(DIR_KEY, {bucket: bucket})
+
+def add_many(pipe: sharding.ShardedPipeline, scores: dict[int, float]):
+    """
+    Queue many tasks at once, given as id -> created_at timestamp, with one
+    command per bucket.
+    """
+    buckets: dict[int, dict[int, float]] = {}
+    for task_id, ts in scores.items():
+        buckets.setdefault(_bucket_of(ts), {})[task_id] = ts
+    for bucket, members in buckets.items():
+        pipe.for_key(_key(bucket)).zadd(_key(bucket), members)
+    if buckets:
+        pipe.home().zadd(DIR_KEY, {bucket: bucket for bucket in buckets})
+
+def remove(pipe: sharding.ShardedPipeline, task_id: int, created_at: datetime.datetime | None = None):
+    """
+    Queue the removal of a task. Without created_at it is removed from every
+    bucket, which costs one extra round trip to read the directory.
+    """
+    if created_at is not None:
+        buckets = [_bucket_of(created_at.timestamp())]
+    else:
+        buckets = [int(bucket) for bucket in redis_client.zrange(DIR_KEY, 0, -1)]
+    for bucket in buckets:
+        pipe.for_key(_key(bucket)).zrem(_key(bucket), task_id)
+
+def get_page_ids(start: int, count: int) -> list[int]:
+    """
+    Get `count` task IDs newest first, starting at offset `start`.
+
+    The directory is walked newest first, reading bucket sizes
+    INDEX_BUCKET_SCAN_BATCH at a time until the page is covered, so the
+    newest pages cost the same however much history there is. The needed
+    slices are then read from their shards. Buckets never overlap in score,
+    so the slices concatenate in bucket order.
+    """
+    slices = []
+    remaining = count
+    offset = 0
+    while remaining > 0:
+        buckets = [
+            int(bucket)
+            for bucket in redis_client.zrevrange(DIR_KEY, offset, offset + INDEX_BUCKET_SCAN_BATCH - 1)
+        ]
+        if not buckets:
+            break
+        offset += len(buckets)
+
+        pipe = sharding.ShardedPipeline(transaction=False)
+        for bucket in buckets:
+            pipe.for_key(_key(bucket)).zcard(_key(bucket))
+        sizes = pipe.execute()
+
+        for bucket, size in zip(buckets, sizes):
+            if remaining <= 0:
+                break
+            if start >= size:
+                start -= size
+                continue
+            stop = min(size, start + remaining) - 1
+            slices.append((bucket, start, stop))
+            remaining -= stop - start + 1
+            start = 0
+
+    if not slices:
+        return []
+    pipe = sharding.ShardedPipeline(transaction=False)
+    for bucket, first, last in slices:
+        pipe.for_key(_key(bucket)).zrevrange(_key(bucket), first, last)
+    return [int(task_id) for ids in pipe.execute() for task_id in ids][:count]
+
+def rebuild(entries: list[tuple[int, datetime.datetime]]) -> int:
+    """
+    Replace the index with the given (id, created_at) entries. Each bucket is
+    built in a scratch key and swapped in, and buckets with no tasks left are
+    dropped.
+
+    Returns:
+        The number of buckets
+    """
+    buckets: dict[int, dict[int, float]] = {}
+    for task_id, created_at in entries:
+        ts = created_at.timestamp()
+        buckets.setdefault(_bucket_of(ts), {})[task_id] = ts
+    stale = {int(bucket) for bucket in redis_client.zrange(DIR_KEY, 0, -1)} - buckets.keys()
+
+    pipe = sharding.ShardedPipeline(transaction=False)
+    for bucket, members in buckets.items():
+        key = _key(bucket)
+        scratch_key = f"{key}:rebuild"
+        shard = pipe.for_key(key)
+        shard.delete(scratch_key)
+        items = list(members.items())
+        for offset in range(0, len(items), 10000):
+            shard.zadd(scratch_key, dict(items[offset:offset + 10000]))
+        shard.rename(scratch_key, key)
+    for bucket in stale:
+        pipe.for_key(_key(bucket)).delete(_key(bucket))
+    pipe.execute()
+
+    pipe = redis_client.pipeline()
+    pipe.delete(DIR_REBUILD_KEY)
+    if buckets:
+        pipe.zadd(DIR_REBUILD_KEY, {bucket: bucket for bucket in buckets})
+        pipe.rename(DIR_REBUILD_KEY, DIR_KEY)
+    else:
+        pipe.delete(DIR_KEY)
+    pipe.execute()
+    return len(buckets)
@@ -0,0 +1,102 @@
+import time
+import datetime
+import threading
+import redis
+from app.core import metrics
+from app.core.config import settings
+
+# Errors that mean Redis is unreachable, as opposed to a bad command
+REDIS_UNAVAILABLE = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+
+class CircuitOpenError(redis.exceptions.ConnectionError):
+    """
+    Raised instead of calling Redis while the circuit is open.
+    Subclasses ConnectionError so existing Redis error handling covers it.
+    """
+
+class CircuitBreaker:
+    """
+    Fails fast after repeated connection errors instead of letting every caller
+    wait for its own socket timeout.
+
+    closed:    calls go through, consecutive failures are counted
+    open:      calls are rejected immediately until `reset_timeout` has passed
+    half-open: a single trial call is let through; success closes the circuit
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    # Only connectivity problems trip the breaker, not command errors
+    FAILURES = REDIS_UNAVAILABLE
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def is_open(self) -> bool:
+        return self.state != self.CLOSED
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                print(f"[{datetime.datetime.now()}] Circuit {self.name} closed")
+                metrics.set_gauge(f"circuit.{self.name}.open", 0)
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state == self.CLOSED:
+                    print(f"[{datetime.datetime.now()}] Circuit {self.name} opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                metrics.set_gauge(f"circuit.{self.name}.open", 1)
+
+    def call(self, func, *args, **kwargs):
+        if not self.allow():
+            metrics.inc_counter(f"circuit.{self.name}.rejected")
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+        try:
+            result = func(*args, **kwargs)
+        except self.FAILURES as e:
+            if not isinstance(e, CircuitOpenError):
+                self.record_failure()
+            raise
+        except Exception:
+            # Any other error (NoScriptError after a restart, a bad command)
+            # means the server answered, so it counts as a success. Otherwise a
+            # failed half-open trial would leave the circuit half-open for good.
+            self.record_success()
+            raise
+        self.record_success()
+        return result
+
+# Shared by every Redis client used for caching, rate limiting and publishing
+redis_breaker = CircuitBreaker(
+    "redis",
+    failure_threshold=settings.REDIS_BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.REDIS_BREAKER_RESET_TIMEOUT
+)
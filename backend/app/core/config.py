@@ -8,12 +8,53 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "todo_db")
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "postgres")
     POSTGRES_PORT: int = int(os.getenv("POSTGRES_PORT", 5432))
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
 
     # redis config
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
     REDIS_DB: int = int(os.getenv("REDIS_DB", 0))
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 2))
+    REDIS_BREAKER_FAILURE_THRESHOLD: int = int(os.getenv("REDIS_BREAKER_FAILURE_THRESHOLD", 3))
+    REDIS_BREAKER_RESET_TIMEOUT: float = float(os.getenv("REDIS_BREAKER_RESET_TIMEOUT", 5))
     TASKS_CHANNEL: str = os.getenv("TASKS_CHANNEL", "tasks_channel")
+    # nodes that task bodies, index buckets and rate-limit keys are spread over,
+    # as "host:port,host:port". Empty keeps everything on REDIS_HOST.
+    REDIS_SHARDS: str = os.getenv("REDIS_SHARDS", "")
+
+    # admission control per route class: concurrent requests, wait queue length, max wait (seconds)
+    THREADPOOL_SIZE: int = int(os.getenv("THREADPOOL_SIZE", 48))
+    ADMISSION_READ_LIMIT: int = int(os.getenv("ADMISSION_READ_LIMIT", 32))
+    ADMISSION_READ_QUEUE: int = int(os.getenv("ADMISSION_READ_QUEUE", 64))
+    ADMISSION_READ_TIMEOUT: float = float(os.getenv("ADMISSION_READ_TIMEOUT", 1.0))
+    ADMISSION_WRITE_LIMIT: int = int(os.getenv("ADMISSION_WRITE_LIMIT", 8))
+    ADMISSION_WRITE_QUEUE: int = int(os.getenv("ADMISSION_WRITE_QUEUE", 32))
+    ADMISSION_WRITE_TIMEOUT: float = float(os.getenv("ADMISSION_WRITE_TIMEOUT", 2.0))
+    ADMISSION_ADMIN_LIMIT: int = int(os.getenv("ADMISSION_ADMIN_LIMIT", 1))
+    ADMISSION_ADMIN_QUEUE: int = int(os.getenv("ADMISSION_ADMIN_QUEUE", 0))
+    ADMISSION_ADMIN_TIMEOUT: float = float(os.getenv("ADMISSION_ADMIN_TIMEOUT", 1.0))
+
+    # create missing tables during warm-up instead of via `python -m app.core.schema`
+    CREATE_TABLES_ON_STARTUP: bool = os.getenv("CREATE_TABLES_ON_STARTUP", "false").lower() == "true"
+
+    # task index engine: "zset" (sorted set), "packed" (packed id blocks) or
+    # "bucketed" (sorted sets per time bucket, spread over REDIS_SHARDS)
+    TASK_INDEX_ENGINE: str = os.getenv("TASK_INDEX_ENGINE", "zset")
+
+    # opt-in request profiling: fraction of requests sampled, honour the
+    # X-Profile header, and dump stack samples of profiled requests to PROFILE_DIR
+    PROFILE_SAMPLE_RATE: float = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    PROFILE_HEADER_ENABLED: bool = os.getenv("PROFILE_HEADER_ENABLED", "false").lower() == "true"
+    PROFILE_CAPTURE_STACKS: bool = os.getenv("PROFILE_CAPTURE_STACKS", "false").lower() == "true"
+    PROFILE_DIR: str = os.getenv("PROFILE_DIR", "/tmp/profiles")
+    # Only the newest stack sample files are kept in PROFILE_DIR
+    PROFILE_MAX_FILES: int = int(os.getenv("PROFILE_MAX_FILES", 200))
+
+    # where export jobs write their files
+    EXPORT_DIR: str = os.getenv("EXPORT_DIR", "/tmp/exports")
 
     class Config:
         env_file = ".env"
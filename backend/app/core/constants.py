@@ -5,6 +5,72 @@ class AnalyticsCounters(Enum):
     TASKS_UPDATED = "tasks_updated"
     TASKS_DELETED = "tasks_deleted"
 
+class TaskAggregates(Enum):
+    TOTAL = "tasks_total"
+    COMPLETED = "tasks_completed"
+    PENDING = "tasks_pending"
+
 PAGE_SIZE = 20
 MAX_TASK_TTL = 3600
-MAX_REDIS_MEMORY = "512mb"
\ No newline at end of file
+MAX_REDIS_MEMORY = "512mb"
+
+# sharded cache keyspace
+SHARD_VIRTUAL_NODES = 160
+INDEX_BUCKET_SECONDS = 24 * 60 * 60
+# Buckets whose sizes are read per round trip when locating a page
+INDEX_BUCKET_SCAN_BATCH = 8
+
+# packed task index
+PACKED_INDEX_BLOCK_SIZE = 4096
+PACKED_INDEX_COMPACT_INTERVAL = 30
+
+# degraded mode (Redis unavailable)
+DEGRADED_PAGE_CACHE_SIZE = 256
+DEGRADED_PAGE_CACHE_TTL = 5
+PUBLISH_BUFFER_SIZE = 1000
+
+# per-minute analytics ring (7 days)
+TIMESERIES_RING_MINUTES = 7 * 24 * 60
+
+# task state aggregates
+EXPIRING_SOON_WINDOW = 24 * 60 * 60
+AGGREGATE_REAP_INTERVAL = 30
+AGGREGATE_RECONCILE_INTERVAL = 600
+# Expiry rows streamed and loaded into Redis per round trip when reconciling
+AGGREGATE_RECONCILE_BATCH_SIZE = 10000
+# Safety expiry of the reconcile-in-progress flag, in case a reconcile dies
+AGGREGATE_RECONCILE_FLAG_TTL = 600
+
+# task change log (index resync)
+CHANGE_REPLAY_BATCH_SIZE = 5000
+CHANGE_LOG_RETENTION = 24 * 60 * 60
+# Rebuilds replay changes logged this many seconds before their scan, since
+# sequence numbers are taken before commit and can commit out of order
+CHANGE_REPLAY_LAG = 60
+# bulk populate
+POPULATE_BATCH_SIZE = 20000
+POPULATE_WORKERS = 4
+POPULATE_MAX_WORKERS = 16
+
+# streaming export
+EXPORT_BATCH_SIZE = 2000
+
+# request profiling
+PROFILE_STACK_INTERVAL = 0.005
+PROFILE_RECENT_SIZE = 100
+
+# materialized head-of-list pages
+HEAD_VIEW_PAGES = 5
+HEAD_VIEW_LOCAL_TTL = 1
+
+# background jobs: concurrent jobs per kind in each worker process
+JOB_CONCURRENCY = {
+    "populate": 1,
+    "rebuild_index": 1,
+    "export": 2,
+    "reconcile": 1
+}
+JOB_PROGRESS_INTERVAL = 1
+JOB_HEARTBEAT_INTERVAL = 10
+JOB_STALE_AFTER = 60
+JOB_LIST_LIMIT = 50
@@ -1,5 +1,7 @@
+import time
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from app.core import metrics
 from app.core.config import settings
 
 DATABASE_URL = (
@@ -8,13 +10,53 @@ DATABASE_URL = (
     f"{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 )
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(
+    DATABASE_URL,
+    pool_pre_ping=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+class LazySession:
+    """
+    Session handle that only creates a session and checks out a pooled
+    connection the first time it is used, so requests served entirely from
+    Redis never touch the pool.
+    """
+
+    def __init__(self):
+        self._session: Session | None = None
+        self.used = False
+
+    def _get(self) -> Session:
+        self.used = True
+        if self._session is None:
+            started = time.perf_counter()
+            session = SessionLocal()
+            # Check out eagerly so the time spent waiting on the pool is measurable
+            session.connection()
+            metrics.observe("db.pool_wait_ms", (time.perf_counter() - started) * 1000)
+            metrics.set_gauge("db.pool_checked_out", engine.pool.checkedout())
+            self._session = session
+        return self._session
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
 def get_db():
-    db = SessionLocal()
+    db = LazySession()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        if not db.used:
+            metrics.inc_counter("db.sessions_skipped")
+        db.close()
@@ -0,0 +1,164 @@
+import json
+import threading
+from app.core.constants import PAGE_SIZE, HEAD_VIEW_PAGES, HEAD_VIEW_LOCAL_TTL
+from app.core.local_cache import LocalTTLCache
+from app.core.redis_clients import redis_client
+
+# The first HEAD_VIEW_PAGES pages of the task list, kept as ready-to-send JSON
+# blobs in a single hash:
+#   gen      bumped by every write, so a rebuild that raced a write is discarded
+#   items    the entries the pages are cut from, newest first, with one spare
+#            page so deletes can shift the next task in
+#   complete "1" when items holds every task
+#   page:N   the JSON array served for page N
+HEAD_KEY = "tasks_head"
+CAPACITY = (HEAD_VIEW_PAGES + 1) * PAGE_SIZE
+
+# Each item is {s: created_at timestamp, i: id, j: serialized task}. Items are
+# ordered by (s, i) descending, like the task index. Scores are kept as
+# strings because cjson only encodes numbers to 14 significant digits.
+_WRITE_PAGES = """
+local function write_pages(items, complete, pages, size)
+    local fields = {}
+    for n = 1, pages do
+        local parts = {}
+        for k = (n - 1) * size + 1, math.min(n * size, #items) do
+            parts[#parts + 1] = items[k].j
+        end
+        fields[#fields + 1] = 'page:' .. n
+        fields[#fields + 1] = '[' .. table.concat(parts, ',') .. ']'
+    end
+    redis.call('HSET', KEYS[1], 'items', cjson.encode(items), 'complete', complete, unpack(fields))
+end
+"""
+
+# Applies one write to the view. A new or updated task is placed by its
+# created_at; one older than the whole view is ignored. Deleting a task leaves
+# a hole that the spare page fills; once the spare page runs out the view is
+# dropped and rebuilt on the next read.
+# ARGV: op ('upsert' or 'delete'), id, score, json, capacity, pages, page size
+_PATCH_SCRIPT = redis_client.register_script(_WRITE_PAGES + """
+local gen = redis.call('HINCRBY', KEYS[1], 'gen', 1)
+local raw = redis.call('HGET', KEYS[1], 'items')
+if not raw then
+    return gen
+end
+local items = cjson.decode(raw)
+local complete = redis.call('HGET', KEYS[1], 'complete') or '0'
+local id = tonumber(ARGV[2])
+local pages = tonumber(ARGV[6])
+local size = tonumber(ARGV[7])
+local changed = false
+for k = #items, 1, -1 do
+    if items[k].i == id then
+        table.remove(items, k)
+        changed = true
+    end
+end
+
+if ARGV[1] == 'upsert' then
+    local score = tonumber(ARGV[3])
+    local pos = #items + 1
+    for k = 1, #items do
+        local s = tonumber(items[k].s)
+        if score > s or (score == s and id > items[k].i) then
+            pos = k
+            break
+        end
+    end
+    if pos <= #items or complete == '1' then
+        table.insert(items, pos, {s = ARGV[3], i = id, j = ARGV[4]})
+        changed = true
+    end
+    while #items > tonumber(ARGV[5]) do
+        table.remove(items)
+        complete = '0'
+    end
+elseif changed and complete ~= '1' and #items < pages * size then
+    local fields = {'items', 'complete'}
+    for n = 1, pages do
+        fields[#fields + 1] = 'page:' .. n
+    end
+    redis.call('HDEL', KEYS[1], unpack(fields))
+    return gen
+end
+
+if changed then
+    write_pages(items, complete, pages, size)
+end
+return gen
+""")
+
+# Stores a freshly built view unless a write bumped the generation meanwhile.
+# ARGV: gen, items json, complete, pages, page size
+_STORE_SCRIPT = redis_client.register_script(_WRITE_PAGES + """
+if (redis.call('HGET', KEYS[1], 'gen') or '0') ~= ARGV[1] then
+    return 0
+end
+write_pages(cjson.decode(ARGV[2]), ARGV[3], tonumber(ARGV[4]), tonumber(ARGV[5]))
+return 1
+""")
+
+_PAGE_FIELDS = [f"page:{n}" for n in range(1, HEAD_VIEW_PAGES + 1)]
+
+# Pages read from Redis, served without a round trip for HEAD_VIEW_LOCAL_TTL
+# seconds. Cleared by local writes, so other workers' writes are visible
+# after at most the TTL.
+_local_pages = LocalTTLCache(HEAD_VIEW_PAGES, HEAD_VIEW_LOCAL_TTL)
+# One rebuild per worker at a time; other requests use the normal path
+rebuild_lock = threading.Lock()
+
+def covers(page: int) -> bool:
+    return 1 <= page <= HEAD_VIEW_PAGES
+
+def get_page(page: int) -> bytes | None:
+    """
+    Get the serialized page, or None when the view hasn't been built.
+    """
+    blob = _local_pages.get(page)
+    if blob is not None:
+        return blob
+    blob = redis_client.hget(HEAD_KEY, f"page:{page}")
+    if blob is not None:
+        _local_pages.set(page, blob)
+    return blob
+
+def generation() -> str:
+    return (redis_client.hget(HEAD_KEY, "gen") or b"0").decode("utf-8")
+
+def store(gen: str, items: list[tuple[float, int, str]]) -> bool:
+    """
+    Store a view built from (created_at timestamp, id, task json) entries,
+    newest first, read after `gen` was taken.
+
+    Returns:
+        False if a write happened in between and the view was discarded
+    """
+    entries = [{"s": repr(score), "i": task_id, "j": blob} for score, task_id, blob in items[:CAPACITY]]
+    complete = "1" if len(items) < CAPACITY else "0"
+    return bool(_STORE_SCRIPT(keys=[HEAD_KEY], args=[
+        gen, json.dumps(entries), complete, HEAD_VIEW_PAGES, PAGE_SIZE
+    ]))
+
+def _patch(op: str, task_id: int, score: float = 0, blob: str = ""):
+    _local_pages.clear()
+    _PATCH_SCRIPT(keys=[HEAD_KEY], args=[
+        op, task_id, repr(score), blob, CAPACITY, HEAD_VIEW_PAGES, PAGE_SIZE
+    ])
+
+def upsert(task_id: int, score: float, blob: str):
+    _patch("upsert", task_id, score, blob)
+
+def delete(task_id: int):
+    _patch("delete", task_id)
+
+def invalidate():
+    """
+    Drop the view, for changes that bypass the write paths (index rebuilds,
+    bulk loads, writes made while Redis was down).
+    """
+    _local_pages.clear()
+    pipe = redis_client.pipeline()
+    pipe.hincrby(HEAD_KEY, "gen", 1)
+    pipe.hdel(HEAD_KEY, "items", "complete", *_PAGE_FIELDS)
+    pipe.execute()
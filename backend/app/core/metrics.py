@@ -0,0 +1,54 @@
+import threading
+from collections import deque
+
+# Number of recent samples kept per timing metric for percentile calculations
+MAX_SAMPLES = 2048
+
+_lock = threading.Lock()
+_gauges: dict[str, float] = {}
+_counters: dict[str, int] = {}
+_timings: dict[str, deque] = {}
+
+def set_gauge(name: str, value: float):
+    with _lock:
+        _gauges[name] = value
+
+def inc_counter(name: str, amount: int = 1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def observe(name: str, value: float):
+    """
+    Record a timing sample (in milliseconds) for the named metric.
+    """
+    with _lock:
+        samples = _timings.get(name)
+        if samples is None:
+            samples = _timings[name] = deque(maxlen=MAX_SAMPLES)
+        samples.append(value)
+
+def _percentile(ordered: list, pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def snapshot() -> dict:
+    """
+    Get a point-in-time copy of every metric in this process.
+    """
+    with _lock:
+        gauges = dict(_gauges)
+        counters = dict(_counters)
+        timings = {name: sorted(samples) for name, samples in _timings.items() if samples}
+
+    return {
+        "gauges": gauges,
+        "counters": counters,
+        "timings": {
+            name: {
+                "count": len(ordered),
+                "p50": _percentile(ordered, 50),
+                "p99": _percentile(ordered, 99),
+                "max": ordered[-1]
+            }
+            for name, ordered in timings.items()
+        }
+    }
@@ -0,0 +1,256 @@
+import struct
+import datetime
+from app.core.constants import PACKED_INDEX_BLOCK_SIZE
+from app.core.redis_clients import redis_client
+
+# All keys share the {tasks_packed} hash tag so the Lua scripts below only ever
+# touch a single slot.
+DIR_KEY = "{tasks_packed}:dir"
+META_KEY = "{tasks_packed}:meta"
+NEXT_BLOCK_KEY = "{tasks_packed}:next_block"
+BLOCK_PREFIX = "{tasks_packed}:block:"
+
+# Task IDs are stored as big-endian unsigned 32-bit ints (Task.id is an Integer
+# column). 0 is never a valid ID, so it doubles as the tombstone marker.
+ID_WIDTH = 4
+TOMBSTONE = b"\x00" * ID_WIDTH
+
+# Appends to the newest block, opening a new one when it is full.
+# KEYS: dir, meta, next_block. ARGV: packed id, block size, created_at ts, block prefix
+_APPEND_SCRIPT = redis_client.register_script(r"""
+local head = redis.call('LINDEX', KEYS[1], -1)
+local len = 0
+if head then
+    len = tonumber(redis.call('HGET', KEYS[2], head .. ':len') or '0')
+end
+if (not head) or len >= tonumber(ARGV[2]) then
+    head = tostring(redis.call('INCR', KEYS[3]))
+    redis.call('RPUSH', KEYS[1], head)
+    redis.call('HSET', KEYS[2], head .. ':min_ts', ARGV[3], head .. ':max_ts', ARGV[3])
+end
+redis.call('APPEND', ARGV[4] .. head, ARGV[1])
+redis.call('HINCRBY', KEYS[2], head .. ':len', 1)
+redis.call('HINCRBY', KEYS[2], head .. ':live', 1)
+local ts = tonumber(ARGV[3])
+if ts < tonumber(redis.call('HGET', KEYS[2], head .. ':min_ts') or ARGV[3]) then
+    redis.call('HSET', KEYS[2], head .. ':min_ts', ARGV[3])
+end
+if ts > tonumber(redis.call('HGET', KEYS[2], head .. ':max_ts') or ARGV[3]) then
+    redis.call('HSET', KEYS[2], head .. ':max_ts', ARGV[3])
+end
+return head
+""")
+
+# Replaces an ID with a tombstone. When a created_at timestamp is given only the
+# blocks whose [min_ts, max_ts] range covers it are scanned.
+# KEYS: dir, meta. ARGV: packed id, created_at ts or '', block prefix
+_TOMBSTONE_SCRIPT = redis_client.register_script(r"""
+local blocks = redis.call('LRANGE', KEYS[1], 0, -1)
+local ts = tonumber(ARGV[2])
+for i = #blocks, 1, -1 do
+    local b = blocks[i]
+    local scan = true
+    if ts then
+        local lo = tonumber(redis.call('HGET', KEYS[2], b .. ':min_ts') or '0')
+        local hi = tonumber(redis.call('HGET', KEYS[2], b .. ':max_ts') or '0')
+        scan = ts >= lo - 1 and ts <= hi + 1
+    end
+    if scan then
+        local data = redis.call('GET', ARGV[3] .. b)
+        if data then
+            local pos = 1
+            while true do
+                local s = string.find(data, ARGV[1], pos, true)
+                if not s then break end
+                if (s - 1) % 4 == 0 then
+                    redis.call('SETRANGE', ARGV[3] .. b, s - 1, '\0\0\0\0')
+                    redis.call('HINCRBY', KEYS[2], b .. ':live', -1)
+                    return 1
+                end
+                pos = s + 1
+            end
+        end
+    end
+end
+return 0
+""")
+
+# Rewrites a block without its tombstones. Empty blocks are dropped unless they
+# are the current head block.
+# KEYS: dir, meta. ARGV: block id, block prefix
+_COMPACT_SCRIPT = redis_client.register_script(r"""
+local b = ARGV[1]
+local key = ARGV[2] .. b
+local data = redis.call('GET', key)
+if not data then return 0 end
+local parts = {}
+local n = 0
+for i = 1, #data, 4 do
+    local word = string.sub(data, i, i + 3)
+    if word ~= '\0\0\0\0' then
+        n = n + 1
+        parts[n] = word
+    end
+end
+local removed = math.floor(#data / 4) - n
+if n == 0 and redis.call('LINDEX', KEYS[1], -1) ~= b then
+    redis.call('DEL', key)
+    redis.call('LREM', KEYS[1], 0, b)
+    redis.call('HDEL', KEYS[2], b .. ':len', b .. ':live', b .. ':min_ts', b .. ':max_ts')
+    return removed
+end
+redis.call('SET', key, table.concat(parts))
+redis.call('HSET', KEYS[2], b .. ':len', n, b .. ':live', n)
+return removed
+""")
+
+def _pack(task_id: int) -> bytes:
+    return struct.pack(">I", task_id)
+
+def _unpack(data: bytes | None) -> tuple:
+    if not data:
+        return ()
+    count = len(data) // ID_WIDTH
+    return struct.unpack(f">{count}I", data[:count * ID_WIDTH])
+
+def _block_stats(meta: dict, block: str) -> tuple[int, int]:
+    length = int(meta.get(f"{block}:len".encode(), 0))
+    live = int(meta.get(f"{block}:live".encode(), 0))
+    return length, live
+
+def exists() -> bool:
+    return bool(redis_client.exists(DIR_KEY))
+
+def append(task_id: int, created_at: datetime.datetime):
+    """
+    Append a newly created task to the head (newest) block.
+    """
+    _APPEND_SCRIPT(
+        keys=[DIR_KEY, META_KEY, NEXT_BLOCK_KEY],
+        args=[_pack(task_id), PACKED_INDEX_BLOCK_SIZE, repr(created_at.timestamp()), BLOCK_PREFIX]
+    )
+
+def tombstone(task_id: int, created_at: datetime.datetime | None = None) -> bool:
+    """
+    Mark a task as deleted. The slot is reclaimed later by compact_blocks.
+
+    Returns:
+        True if the task was found in the index
+    """
+    ts = repr(created_at.timestamp()) if created_at else ""
+    return bool(_TOMBSTONE_SCRIPT(keys=[DIR_KEY, META_KEY], args=[_pack(task_id), ts, BLOCK_PREFIX]))
+
+def get_page_ids(start: int, count: int) -> list[int]:
+    """
+    Get `count` task IDs, newest first, skipping the `start` newest ones.
+
+    Blocks without tombstones are read with a single GETRANGE covering exactly
+    the requested slice; blocks that still carry tombstones are read whole and
+    filtered.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.lrange(DIR_KEY, 0, -1)
+    pipe.hgetall(META_KEY)
+    blocks, meta = pipe.execute()
+
+    skip = start
+    remaining = count
+    reads = []
+    pipe = redis_client.pipeline(transaction=False)
+    for raw_block in reversed(blocks):
+        block = raw_block.decode("utf-8")
+        length, live = _block_stats(meta, block)
+        if skip >= live:
+            skip -= live
+            continue
+
+        key = f"{BLOCK_PREFIX}{block}"
+        if live == length:
+            hi = length - 1 - skip
+            lo = max(0, hi - remaining + 1)
+            pipe.getrange(key, lo * ID_WIDTH, (hi + 1) * ID_WIDTH - 1)
+            reads.append(None)
+            remaining -= hi - lo + 1
+        else:
+            pipe.get(key)
+            reads.append((skip, remaining))
+            remaining -= min(live - skip, remaining)
+        skip = 0
+        if remaining <= 0:
+            break
+
+    if not reads:
+        return []
+
+    ids = []
+    for spec, data in zip(reads, pipe.execute()):
+        newest_first = [task_id for task_id in reversed(_unpack(data)) if task_id]
+        if spec is None:
+            ids.extend(newest_first)
+        else:
+            block_skip, wanted = spec
+            ids.extend(newest_first[block_skip:block_skip + wanted])
+    return ids[:count]
+
+def rebuild(entries: list) -> int:
+    """
+    Replace the whole index with the given (id, created_at) pairs.
+
+    Entries are sorted oldest first before being packed into blocks.
+
+    Returns:
+        The number of blocks written
+    """
+    entries = sorted(entries, key=lambda entry: (entry[1], entry[0]))
+    old_blocks = redis_client.lrange(DIR_KEY, 0, -1)
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(DIR_KEY, META_KEY, NEXT_BLOCK_KEY, *[f"{BLOCK_PREFIX}{b.decode('utf-8')}" for b in old_blocks])
+
+    block_ids = []
+    meta = {}
+    for block, offset in enumerate(range(0, len(entries), PACKED_INDEX_BLOCK_SIZE), start=1):
+        chunk = entries[offset:offset + PACKED_INDEX_BLOCK_SIZE]
+        pipe.set(f"{BLOCK_PREFIX}{block}", struct.pack(f">{len(chunk)}I", *(task_id for task_id, _ in chunk)))
+        meta[f"{block}:len"] = len(chunk)
+        meta[f"{block}:live"] = len(chunk)
+        meta[f"{block}:min_ts"] = repr(chunk[0][1].timestamp())
+        meta[f"{block}:max_ts"] = repr(chunk[-1][1].timestamp())
+        block_ids.append(block)
+
+    if block_ids:
+        pipe.rpush(DIR_KEY, *block_ids)
+        pipe.hset(META_KEY, mapping=meta)
+    pipe.set(NEXT_BLOCK_KEY, len(block_ids))
+    pipe.execute()
+    return len(block_ids)
+
+def compact_blocks() -> int:
+    """
+    Rewrite every block that carries tombstones.
+
+    Returns:
+        The number of tombstones reclaimed
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.lrange(DIR_KEY, 0, -1)
+    pipe.hgetall(META_KEY)
+    blocks, meta = pipe.execute()
+
+    reclaimed = 0
+    for raw_block in blocks:
+        block = raw_block.decode("utf-8")
+        length, live = _block_stats(meta, block)
+        if live < length:
+            reclaimed += _COMPACT_SCRIPT(keys=[DIR_KEY, META_KEY], args=[block, BLOCK_PREFIX])
+    return reclaimed
+
+def memory_usage() -> int:
+    """
+    Total bytes used by the index keys, as reported by MEMORY USAGE.
+    """
+    blocks = redis_client.lrange(DIR_KEY, 0, -1)
+    pipe = redis_client.pipeline(transaction=False)
+    for key in [DIR_KEY, META_KEY, NEXT_BLOCK_KEY] + [f"{BLOCK_PREFIX}{b.decode('utf-8')}" for b in blocks]:
+        pipe.memory_usage(key)
+    return sum(usage or 0 for usage in pipe.execute())
@@ -0,0 +1,243 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import datetime
+import threading
+from collections import Counter, deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from app.core import metrics
+from app.core.config import settings
+from app.core.constants import PROFILE_STACK_INTERVAL, PROFILE_RECENT_SIZE
+
+PROFILE_HEADER = b"x-profile"
+
+# Runtime switches, initialised from Settings and changed through /profiling.
+# Per worker process.
+_config = {
+    "sample_rate": settings.PROFILE_SAMPLE_RATE,
+    "header_enabled": settings.PROFILE_HEADER_ENABLED,
+    "capture_stacks": settings.PROFILE_CAPTURE_STACKS
+}
+
+# Profile of the request being handled in this context, None when not profiled
+_current: ContextVar = ContextVar("request_profile", default=None)
+_NOOP = nullcontext()
+
+# Summaries of the most recent profiled requests
+recent_profiles: deque = deque(maxlen=PROFILE_RECENT_SIZE)
+
+class RequestProfile:
+    def __init__(self, method: str, path: str, capture_stacks: bool):
+        self.method = method
+        self.path = path
+        self.capture_stacks = capture_stacks
+        self.started = time.perf_counter()
+        # stage name -> [total ms, calls]
+        self.stages: dict[str, list] = {}
+        self.thread_ids: set[int] = set()
+        self.stacks: Counter = Counter()
+
+    def add(self, name: str, elapsed_ms: float):
+        stage = self.stages.get(name)
+        if stage is None:
+            self.stages[name] = [elapsed_ms, 1]
+        else:
+            stage[0] += elapsed_ms
+            stage[1] += 1
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary(self) -> dict:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "at": datetime.datetime.now().isoformat(),
+            "total_ms": round(self.elapsed_ms(), 3),
+            "stages": {name: {"ms": round(ms, 3), "calls": calls} for name, (ms, calls) in self.stages.items()},
+            "stack_samples": sum(self.stacks.values())
+        }
+
+class _Stage:
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        # Handlers run on pool threads; the sampler follows whichever thread does the work
+        self.profile.thread_ids.add(threading.get_ident())
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+def stage(name: str):
+    """
+    Time a block as one stage of the current request's profile:
+
+        with profiling.stage("redis.page_ids"):
+            ...
+
+    Costs a single context variable lookup when the request isn't profiled.
+    """
+    profile = _current.get()
+    if profile is None:
+        return _NOOP
+    return _Stage(profile, name)
+
+def get_config() -> dict:
+    return dict(_config)
+
+def configure(sample_rate: float | None = None, header_enabled: bool | None = None, capture_stacks: bool | None = None) -> dict:
+    if sample_rate is not None:
+        _config["sample_rate"] = sample_rate
+    if header_enabled is not None:
+        _config["header_enabled"] = header_enabled
+    if capture_stacks is not None:
+        _config["capture_stacks"] = capture_stacks
+    print(f"[{datetime.datetime.now()}] Profiling configured: {_config}")
+    return get_config()
+
+def _fold(frame) -> str:
+    # Root first, in the collapsed format read by flamegraph.pl and speedscope
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class StackSampler:
+    """
+    Samples the stacks of threads working on profiled requests every
+    `interval` seconds. The thread only runs while profiles are active.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._active: set[RequestProfile] = set()
+        self._thread: threading.Thread | None = None
+
+    def register(self, profile: RequestProfile):
+        with self._lock:
+            self._active.add(profile)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def unregister(self, profile: RequestProfile):
+        with self._lock:
+            self._active.discard(profile)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            with self._lock:
+                active = list(self._active)
+            if not active:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            frames = sys._current_frames()
+            for profile in active:
+                for thread_id in list(profile.thread_ids):
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id != own_id:
+                        profile.stacks[_fold(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+stack_sampler = StackSampler(PROFILE_STACK_INTERVAL)
+
+def _write_stacks(profile: RequestProfile) -> str:
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    stamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S%f")
+    route = profile.path.strip("/").replace("/", "_") or "root"
+    path = os.path.join(settings.PROFILE_DIR, f"{stamp}-{profile.method}-{route}.folded")
+    with open(path, "w") as f:
+        for stack, count in profile.stacks.items():
+            f.write(f"{stack} {count}\n")
+    _rotate_stacks()
+    return path
+
+def _rotate_stacks():
+    # File names start with a timestamp, so sorting them puts the oldest first
+    files = sorted(name for name in os.listdir(settings.PROFILE_DIR) if name.endswith(".folded"))
+    for name in files[:max(len(files) - settings.PROFILE_MAX_FILES, 0)]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, name))
+        except FileNotFoundError:
+            # Already removed by a concurrent rotation
+            pass
+
+def _should_profile(scope) -> bool:
+    if _config["header_enabled"]:
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return value not in (b"", b"0", b"false")
+    return random.random() < _config["sample_rate"]
+
+def _server_timing(profile: RequestProfile) -> bytes:
+    parts = [f"{name};dur={ms:.3f}" for name, (ms, _) in profile.stages.items()]
+    parts.append(f"total;dur={profile.elapsed_ms():.3f}")
+    return ", ".join(parts).encode("latin-1")
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that profiles a sample of requests (or those sent with an
+    X-Profile header when enabled). Profiled responses carry a Server-Timing
+    header with the per-stage breakdown; stage timings are also exported as
+    `profile.<stage>_ms` on /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (_config["sample_rate"] > 0 or _config["header_enabled"]):
+            await self.app(scope, receive, send)
+            return
+        if not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"], _config["capture_stacks"])
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", _server_timing(profile))]
+            await send(message)
+
+        if profile.capture_stacks:
+            stack_sampler.register(profile)
+        token = _current.set(profile)
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if profile.capture_stacks:
+                stack_sampler.unregister(profile)
+            await self._finish(profile)
+
+    @staticmethod
+    async def _finish(profile: RequestProfile):
+        for name, (ms, _) in profile.stages.items():
+            metrics.observe(f"profile.{name}_ms", ms)
+        summary = profile.summary()
+        if profile.stacks:
+            try:
+                summary["stacks_file"] = await asyncio.to_thread(_write_stacks, profile)
+            except OSError as e:
+                print(f"[{datetime.datetime.now()}] Error writing stack samples: {str(e)}")
+        recent_profiles.append(summary)
@@ -0,0 +1,31 @@
+import time
+import threading
+
+# Taken as early as possible so boot time covers imports as well
+PROCESS_STARTED = time.perf_counter()
+
+_lock = threading.Lock()
+_checks: dict[str, bool] = {}
+
+def mark(check: str, ready: bool = True):
+    with _lock:
+        _checks[check] = ready
+
+def register(*checks: str):
+    """
+    Declare the checks that must pass before the application is ready.
+    """
+    with _lock:
+        for check in checks:
+            _checks.setdefault(check, False)
+
+def is_ready() -> bool:
+    with _lock:
+        return bool(_checks) and all(_checks.values())
+
+def status() -> dict:
+    with _lock:
+        return dict(_checks)
+
+def seconds_since_start() -> float:
+    return time.perf_counter() - PROCESS_STARTED
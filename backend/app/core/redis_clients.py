@@ -1,32 +1,79 @@
 import redis
+from redis.client import Pipeline
+from app.core.circuit_breaker import redis_breaker
 from app.core.config import settings
 from app.core.constants import MAX_REDIS_MEMORY
 
-# Main Redis client for general operations and caching
-redis_client = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB
-)
+class BreakerPipeline(Pipeline):
+    """
+    Pipeline whose round trips go through the shared Redis circuit breaker.
+    """
+
+    def execute(self, raise_on_error=True):
+        return redis_breaker.call(super().execute, raise_on_error)
+
+    def immediate_execute_command(self, *args, **options):
+        return redis_breaker.call(super().immediate_execute_command, *args, **options)
+
+class BreakerRedis(redis.Redis):
+    """
+    Redis client whose commands go through the shared Redis circuit breaker,
+    so callers fail fast while Redis is down.
+    """
+
+    def execute_command(self, *args, **options):
+        return redis_breaker.call(super().execute_command, *args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None) -> BreakerPipeline:
+        return BreakerPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
 
-# Configure memory settings for the main client
-redis_client.config_set("maxmemory", MAX_REDIS_MEMORY)
-redis_client.config_set("maxmemory-policy", "allkeys-lfu")
+# redis-py only opens a connection on the first command, so creating the
+# clients here has no side effects at import time.
+def _create_client(host: str = settings.REDIS_HOST, port: int = settings.REDIS_PORT) -> redis.Redis:
+    return BreakerRedis(
+        host=host,
+        port=port,
+        db=settings.REDIS_DB,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT
+    )
+
+# Main Redis client for general operations and caching
+redis_client = _create_client()
 
 # Publisher client for task events
-pubsub_redis = redis.Redis(
-    host=settings.REDIS_HOST,
-    port=settings.REDIS_PORT,
-    db=settings.REDIS_DB
-)
+pubsub_redis = _create_client()
+
+def _create_shard_clients() -> dict[str, redis.Redis]:
+    clients = {}
+    for node in filter(None, (node.strip() for node in settings.REDIS_SHARDS.split(","))):
+        host, _, port = node.rpartition(":")
+        if (host, int(port)) == (settings.REDIS_HOST, settings.REDIS_PORT):
+            # The main node can also hold a share of the sharded keys
+            clients[node] = redis_client
+        else:
+            clients[node] = _create_client(host, int(port))
+    return clients
 
-# WebSocket subscriber client
+# Clients for REDIS_SHARDS by "host:port", see app.core.sharding
+shard_clients = _create_shard_clients()
+
+# WebSocket subscriber client. No read timeout: listen() blocks until a message arrives.
 ws_redis = redis.Redis(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
-    db=settings.REDIS_DB
+    db=settings.REDIS_DB,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT
 )
 
+def configure_redis_memory():
+    """
+    Configure memory settings for the main client.
+    Called from the background warm-up rather than at import time.
+    """
+    redis_client.config_set("maxmemory", MAX_REDIS_MEMORY)
+    redis_client.config_set("maxmemory-policy", "allkeys-lfu")
+
 # Function to create a new pubsub object from the ws_redis client
 def create_pubsub():
-    return ws_redis.pubsub() 
\ No newline at end of file
+    return ws_redis.pubsub() 
@@ -1,43 +1,130 @@
 import json
 import datetime
 from app.core.config import settings
-from app.core.constants import AnalyticsCounters, PAGE_SIZE, MAX_TASK_TTL, MAX_REDIS_MEMORY
+from app.core.constants import AnalyticsCounters, PAGE_SIZE, MAX_TASK_TTL, MAX_REDIS_MEMORY, PACKED_INDEX_COMPACT_INTERVAL, PUBLISH_BUFFER_SIZE, CHANGE_REPLAY_BATCH_SIZE, CHANGE_REPLAY_LAG
 from app.repositories.task_repository import TaskRepository
 from app.core.database import get_db
 from sqlalchemy.orm import Session
 import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager
 from app.core.redis_clients import redis_client, pubsub_redis
+from app.core import bucketed_index, head_view, metrics, packed_index, profiling, sharding, timeseries
+from app.core.circuit_breaker import REDIS_UNAVAILABLE
 
-def cache_set_task(task_id: int, task_data: dict, expiry_date: datetime.datetime | None = None):
+# Events that could not be published while Redis was unavailable (oldest dropped first)
+_publish_buffer: deque = deque(maxlen=PUBLISH_BUFFER_SIZE)
+# Tasks written to Postgres while Redis was unavailable, mapped to whether they
+# were deleted. Invalidated on recovery.
+_dirty_tasks: dict[int, bool] = {}
+_degraded_lock = threading.Lock()
+
+# Last task_changes sequence number reflected in the Redis index
+INDEX_WATERMARK_KEY = "tasks_index:watermark"
+# Change-log position seen on the previous monitor tick, see advance_index_watermark
+_pending_watermark: int | None = None
+
+# Moves the watermark forward (never back), and only while the index exists.
+# KEYS: watermark, index. ARGV: seq
+_ADVANCE_WATERMARK_SCRIPT = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+local current = tonumber(redis.call('GET', KEYS[1]) or '-1')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+""")
+
+def _use_packed_index() -> bool:
+    return settings.TASK_INDEX_ENGINE == "packed"
+
+def _use_bucketed_index() -> bool:
+    return settings.TASK_INDEX_ENGINE == "bucketed"
+
+def _index_key() -> str:
+    # Key whose existence means the (non-packed) index has been built
+    return bucketed_index.DIR_KEY if _use_bucketed_index() else "tasks_sorted"
+
+def cache_set_task(task_id: int, task_data: dict, expiry_date: datetime.datetime | None = None, is_new: bool = False):
     key = f"task:{task_id}"
     serialized_data = json.dumps(task_data, default=lambda o: o.isoformat() if hasattr(o, "isoformat") else str(o))
     created_at = task_data.get("created_at", datetime.datetime.utcnow())
     if isinstance(created_at, str):
         created_at = datetime.datetime.fromisoformat(created_at)
 
-    pipe = redis_client.pipeline()
+    pipe = sharding.ShardedPipeline()
     if expiry_date:
         calculated_ttl = (expiry_date - datetime.datetime.utcnow()).total_seconds()
         ttl = min(calculated_ttl, MAX_TASK_TTL) if calculated_ttl > 0 else 0
         if ttl > 0:
-            pipe.set(key, serialized_data, ex=int(ttl))
+            pipe.for_key(key).set(key, serialized_data, ex=int(ttl))
         else:
-            pipe.delete(key)
+            pipe.for_key(key).delete(key)
     else:
-        pipe.set(key, serialized_data, ex=MAX_TASK_TTL)
-    pipe.zadd("tasks_sorted", {task_id: created_at.timestamp()})
+        pipe.for_key(key).set(key, serialized_data, ex=MAX_TASK_TTL)
+    if _use_bucketed_index():
+        bucketed_index.add(pipe, task_id, created_at)
+    elif not _use_packed_index():
+        pipe.home().zadd("tasks_sorted", {task_id: created_at.timestamp()})
     pipe.execute()
 
-def cache_delete_task(task_id: int):
+    # The packed index is append-only, so only brand new tasks are added to it
+    if is_new and _use_packed_index():
+        packed_index.append(task_id, created_at)
+
+def cache_delete_task(task_id: int, created_at: datetime.datetime | None = None):
     key = f"task:{task_id}"
-    pipe = redis_client.pipeline()
-    pipe.delete(key)
-    pipe.zrem("tasks_sorted", task_id)
+    pipe = sharding.ShardedPipeline()
+    pipe.for_key(key).delete(key)
+    if _use_bucketed_index():
+        bucketed_index.remove(pipe, task_id, created_at)
+    elif not _use_packed_index():
+        pipe.home().zrem("tasks_sorted", task_id)
+    pipe.execute()
+
+    if _use_packed_index():
+        packed_index.tombstone(task_id, created_at)
+
+def index_new_tasks(scores: dict[int, float]) -> bool:
+    """
+    Add bulk-loaded tasks (id -> created_at timestamp) to the index without
+    caching their bodies.
+
+    Returns:
+        False for the packed index, which has to be rebuilt instead
+    """
+    if _use_packed_index():
+        return False
+    pipe = sharding.ShardedPipeline(transaction=False)
+    if _use_bucketed_index():
+        bucketed_index.add_many(pipe, scores)
+    else:
+        pipe.home().zadd("tasks_sorted", scores)
     pipe.execute()
+    head_view.invalidate()
+    return True
+
+def index_exists() -> bool:
+    if _use_packed_index():
+        return packed_index.exists()
+    if _use_bucketed_index():
+        return bucketed_index.exists()
+    return bool(redis_client.exists("tasks_sorted"))
+
+def _get_page_ids(start: int, end: int) -> list[int]:
+    if _use_packed_index():
+        return packed_index.get_page_ids(start, end - start + 1)
+    if _use_bucketed_index():
+        return bucketed_index.get_page_ids(start, end - start + 1)
+    return [int(task_id.decode("utf-8")) for task_id in redis_client.zrevrange("tasks_sorted", start, end)]
 
 def cache_get_tasks_page_with_missing(page: int) -> (list, dict, list):
-    # Check if the sorted set exists in Redis
-    if not redis_client.exists("tasks_sorted"):
+    # Check if the index exists in Redis
+    if not index_exists():
         print(f"[{datetime.datetime.now()}] tasks_sorted index not found in Redis, rebuilding it...")
         try:
             # Use the function's internal session handling
@@ -48,25 +135,26 @@ def cache_get_tasks_page_with_missing(page: int) -> (list, dict, list):
     # Continue with original functionality
     start = (page - 1) * PAGE_SIZE
     end = start + PAGE_SIZE - 1
-    task_id_bytes = redis_client.zrevrange("tasks_sorted", start, end)
-    if not task_id_bytes:
+    with profiling.stage("redis.page_ids"):
+        ordered_ids = _get_page_ids(start, end)
+    if not ordered_ids:
         return ([], {}, [])
     
-    ordered_ids = []
-    pipe = redis_client.pipeline()
-    for task_id in task_id_bytes:
-        task_id_parsed = int(task_id.decode("utf-8"))
-        ordered_ids.append(task_id_parsed)
-        pipe.get(f"task:{task_id_parsed}")
-    results = pipe.execute()
+    with profiling.stage("redis.get_tasks"):
+        # One pipeline per shard, sent concurrently
+        pipe = sharding.ShardedPipeline()
+        for task_id in ordered_ids:
+            pipe.for_key(f"task:{task_id}").get(f"task:{task_id}")
+        results = pipe.execute()
 
     cached_tasks = {}
     missing_ids = []
-    for task_id, data in zip(ordered_ids, results):
-        if data:
-            cached_tasks[task_id] = json.loads(data)
-        else:
-            missing_ids.append(task_id)
+    with profiling.stage("json.loads"):
+        for task_id, data in zip(ordered_ids, results):
+            if data:
+                cached_tasks[task_id] = json.loads(data)
+            else:
+                missing_ids.append(task_id)
     return (ordered_ids, cached_tasks, missing_ids)
 
 def increment_counter(counter: AnalyticsCounters) -> int:
@@ -81,8 +169,9 @@ def increment_counter(counter: AnalyticsCounters) -> int:
     """
     counter_key = f"counter:{counter.value}"
     
-    # Increment in Redis
+    # Increment in Redis, along with the current minute's time-series bucket
     new_value = redis_client.incr(counter_key)
+    timeseries.record(counter)
     
     # Publish the counter update event via WebSocket
     counter_event = {
@@ -92,13 +181,79 @@ def increment_counter(counter: AnalyticsCounters) -> int:
         "timestamp": datetime.datetime.utcnow().isoformat()
     }
     
-    pubsub_redis.publish(
-        settings.TASKS_CHANNEL,
-        json.dumps(counter_event)
-    )
+    publish_event(json.dumps(counter_event))
     
     return new_value
 
+def publish_event(message: str):
+    """
+    Publish a task event. While Redis is unavailable the event is buffered and
+    sent by flush_degraded_state once Redis is back; the oldest events are
+    dropped when the buffer is full.
+    """
+    try:
+        pubsub_redis.publish(settings.TASKS_CHANNEL, message)
+    except REDIS_UNAVAILABLE:
+        with _degraded_lock:
+            if len(_publish_buffer) == _publish_buffer.maxlen:
+                metrics.inc_counter("publish.dropped")
+            _publish_buffer.append(message)
+        metrics.inc_counter("publish.buffered")
+
+def mark_task_dirty(task_id: int, deleted: bool = False):
+    """
+    Record a task written to Postgres while Redis was unavailable so its cached
+    copy is dropped on recovery.
+    """
+    with _degraded_lock:
+        _dirty_tasks[task_id] = deleted
+
+def has_degraded_state() -> bool:
+    with _degraded_lock:
+        return bool(_dirty_tasks or _publish_buffer)
+
+def flush_degraded_state(resync: bool = False):
+    """
+    Reconcile Redis with writes made while it was unavailable: drop stale
+    cached tasks and counters, reindex, recount the task aggregates, then
+    send buffered events.
+    """
+    with _degraded_lock:
+        dirty = dict(_dirty_tasks)
+        messages = list(_publish_buffer)
+
+    if dirty:
+        print(f"[{datetime.datetime.now()}] Invalidating {len(dirty)} tasks written while Redis was down")
+        pipe = sharding.ShardedPipeline()
+        for task_id, deleted in dirty.items():
+            if deleted:
+                cache_delete_task(task_id)
+            else:
+                pipe.for_key(f"task:{task_id}").delete(f"task:{task_id}")
+        # Counters are repopulated from the database on the next read
+        pipe.home().delete(*[f"counter:{counter.value}" for counter in AnalyticsCounters])
+        pipe.execute()
+
+    if dirty or resync:
+        # Picks up tasks created or deleted while Redis was down
+        resync_index()
+        # Writes made meanwhile never patched the head view
+        head_view.invalidate()
+        # ...nor the task aggregates, which may also have been lost with Redis
+        from app.services.analytics_service import AnalyticsService
+        with _session(None) as db:
+            AnalyticsService.reconcile_task_aggregates(db)
+
+    for message in messages:
+        pubsub_redis.publish(settings.TASKS_CHANNEL, message)
+
+    with _degraded_lock:
+        for task_id in dirty:
+            _dirty_tasks.pop(task_id, None)
+        for _ in messages:
+            if _publish_buffer:
+                _publish_buffer.popleft()
+
 def get_counter(counter: AnalyticsCounters) -> int | None:
     """
     Get a counter value from Redis.
@@ -124,37 +279,161 @@ def set_counter(counter: AnalyticsCounters, value: int) -> None:
     counter_key = f"counter:{counter.value}"
     redis_client.set(counter_key, value)
 
+def set_counters(values: dict[AnalyticsCounters, int]) -> None:
+    """
+    Set several counters at once in a single Redis round trip.
+    
+    Args:
+        values: Mapping of counter to value
+    """
+    if values:
+        redis_client.mset({f"counter:{counter.value}": value for counter, value in values.items()})
+
+@contextmanager
+def _session(db: Session | None):
+    # Create a session if one wasn't provided, and only close it if we created it
+    if db is not None:
+        yield db
+        return
+    from app.core.database import SessionLocal
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _replay_changes(db: Session, since: int, indexed_ids: set[int] | None = None) -> int:
+    """
+    Apply task_changes entries after `since` to the index and drop the cached
+    bodies they touch. Every operation is idempotent, so replaying an entry
+    twice is harmless. The packed index is append-only, so there an insert
+    is only appended when its ID isn't in `indexed_ids`, the tasks a rebuild
+    has just placed.
+
+    Returns:
+        The last sequence number applied
+    """
+    while True:
+        changes = TaskRepository.get_changes_since(db, since, CHANGE_REPLAY_BATCH_SIZE)
+        if not changes:
+            return since
+
+        pipe = sharding.ShardedPipeline()
+        for change in changes:
+            pipe.for_key(f"task:{change.task_id}").delete(f"task:{change.task_id}")
+            if _use_packed_index():
+                continue
+            if _use_bucketed_index():
+                if change.op == "insert":
+                    bucketed_index.add(pipe, change.task_id, change.task_created_at)
+                elif change.op == "delete":
+                    bucketed_index.remove(pipe, change.task_id, change.task_created_at)
+            elif change.op == "insert":
+                pipe.home().zadd("tasks_sorted", {change.task_id: change.task_created_at.timestamp()})
+            elif change.op == "delete":
+                pipe.home().zrem("tasks_sorted", change.task_id)
+        pipe.execute()
+
+        if _use_packed_index():
+            if indexed_ids is None:
+                indexed_ids = set()
+            for change in changes:
+                if change.op == "insert" and change.task_id not in indexed_ids:
+                    packed_index.append(change.task_id, change.task_created_at)
+                    indexed_ids.add(change.task_id)
+                elif change.op == "delete":
+                    packed_index.tombstone(change.task_id, change.task_created_at)
+
+        since = changes[-1].seq
+        if len(changes) < CHANGE_REPLAY_BATCH_SIZE:
+            return since
+
 def rebuild_sorted_set_index(db=None):
     print(f"[{datetime.datetime.now()}] Rebuilding tasks_sorted index...")
     
-    # Create a session if one wasn't provided
-    session_created = False
-    if db is None:
-        from app.core.database import SessionLocal
-        db = SessionLocal()
-        session_created = True
-    
-    try:
+    with _session(db) as db:
+        # Anything written after this point, deletes included, is replayed on
+        # top of the snapshot so the rebuild never resurrects deleted tasks.
+        # Starts CHANGE_REPLAY_LAG back, because a change can commit after
+        # others with higher sequence numbers.
+        since = TaskRepository.get_last_change_seq_before(
+            db, datetime.datetime.utcnow() - datetime.timedelta(seconds=CHANGE_REPLAY_LAG)
+        )
         tasks = TaskRepository.get_tasks_for_cache_index(db)
+        indexed_ids = None
         
         if not tasks:
-            print(f"[{datetime.datetime.now()}] No tasks found to rebuild index")
+            print(f"[{datetime.datetime.now()}] No tasks found, clearing index")
+        else:
+            print(f"[{datetime.datetime.now()}] Rebuilding index with {len(tasks)} tasks")
+        if _use_packed_index():
+            blocks = packed_index.rebuild([(task.id, task.created_at) for task in tasks])
+            indexed_ids = {task.id for task in tasks}
+            print(f"[{datetime.datetime.now()}] Successfully rebuilt packed index ({blocks} blocks)")
+        elif _use_bucketed_index():
+            buckets = bucketed_index.rebuild([(task.id, task.created_at) for task in tasks])
+            print(f"[{datetime.datetime.now()}] Successfully rebuilt bucketed index ({buckets} buckets)")
+        else:
+            # Build into a scratch key and swap it in, so stale members don't survive
+            scratch_key = "tasks_sorted:rebuild"
+            pipe = redis_client.pipeline()
+            pipe.delete(scratch_key)
+            for offset in range(0, len(tasks), 10000):
+                pipe.zadd(scratch_key, {task.id: task.created_at.timestamp() for task in tasks[offset:offset + 10000]})
+            if tasks:
+                pipe.rename(scratch_key, "tasks_sorted")
+            else:
+                pipe.delete("tasks_sorted")
+            pipe.execute()
+            print(f"[{datetime.datetime.now()}] Successfully rebuilt tasks_sorted index")
+
+        last_seq = _replay_changes(db, since, indexed_ids)
+        redis_client.set(INDEX_WATERMARK_KEY, last_seq)
+        head_view.invalidate()
+
+def resync_index(db=None):
+    """
+    Bring the index up to date after Redis was unreachable by replaying only
+    the changes since the watermark. Falls back to a full rebuild when the
+    watermark or the index is missing, when the change log no longer reaches
+    back to the watermark, or for the packed index.
+    """
+    with _session(db) as db:
+        watermark = redis_client.get(INDEX_WATERMARK_KEY)
+        if watermark is None or not index_exists() or _use_packed_index():
+            rebuild_sorted_set_index(db)
             return
-            
-        print(f"[{datetime.datetime.now()}] Rebuilding index with {len(tasks)} tasks")
-        pipe = redis_client.pipeline()
-        for task in tasks:
-            pipe.zadd("tasks_sorted", {task.id: task.created_at.timestamp()})
-        pipe.execute()
-        print(f"[{datetime.datetime.now()}] Successfully rebuilt tasks_sorted index")
-    finally:
-        # Only close the session if we created it
-        if session_created:
-            db.close()
+
+        watermark = int(watermark)
+        oldest = TaskRepository.get_oldest_change_seq(db)
+        if oldest is not None and oldest > watermark + 1:
+            print(f"[{datetime.datetime.now()}] Change log was pruned past the index watermark")
+            rebuild_sorted_set_index(db)
+            return
+
+        last_seq = _replay_changes(db, watermark)
+        _ADVANCE_WATERMARK_SCRIPT(keys=[INDEX_WATERMARK_KEY, _index_key()], args=[last_seq])
+        print(f"[{datetime.datetime.now()}] Resynced index from change {watermark} to {last_seq}")
+
+def advance_index_watermark():
+    """
+    Move the watermark up to the change-log position seen on the previous call.
+    Lagging one monitor interval behind keeps writes whose cache update is
+    still in flight inside the replay window.
+    """
+    global _pending_watermark
+    if _use_packed_index():
+        return
+
+    with _session(None) as db:
+        latest = TaskRepository.get_latest_change_seq(db)
+    if _pending_watermark is not None:
+        _ADVANCE_WATERMARK_SCRIPT(keys=[INDEX_WATERMARK_KEY, _index_key()], args=[_pending_watermark])
+    _pending_watermark = latest
 
 async def monitor_redis():
     """
-    Monitor Redis connection and rebuild sorted set index if connection was lost.
+    Monitor Redis connection and resync the index if connection was lost.
     """
     redis_was_down = False
     print(f"[{datetime.datetime.now()}] Starting Redis monitoring service")
@@ -162,12 +441,15 @@ async def monitor_redis():
     while True:
         print(f"[{datetime.datetime.now()}] Checking Redis connection")
         try:
-            if redis_client.ping():
-                if redis_was_down:
-                    print(f"[{datetime.datetime.now()}] Redis connection restored, rebuilding index")
-                    # Let rebuild_sorted_set_index handle its own session
-                    rebuild_sorted_set_index()
+            # Every shard has to be reachable before degraded state is flushed
+            if sharding.ping_all():
+                if redis_was_down or has_degraded_state():
+                    if redis_was_down:
+                        print(f"[{datetime.datetime.now()}] Redis connection restored, resyncing index")
+                    await asyncio.to_thread(flush_degraded_state, redis_was_down)
                     redis_was_down = False
+                else:
+                    await asyncio.to_thread(advance_index_watermark)
             else:
                 if not redis_was_down:
                     print(f"[{datetime.datetime.now()}] Redis ping failed but no exception raised")
@@ -176,4 +458,19 @@ async def monitor_redis():
             if not redis_was_down:
                 print(f"[{datetime.datetime.now()}] Redis appears to be down: {str(e)}")
             redis_was_down = True
-        await asyncio.sleep(5)
\ No newline at end of file
+        await asyncio.sleep(5)
+
+async def compact_packed_index():
+    """
+    Periodically reclaim tombstoned slots in the packed task index.
+    """
+    print(f"[{datetime.datetime.now()}] Starting packed index compaction service")
+
+    while True:
+        try:
+            reclaimed = await asyncio.to_thread(packed_index.compact_blocks)
+            if reclaimed:
+                print(f"[{datetime.datetime.now()}] Compacted packed index, reclaimed {reclaimed} slots")
+        except Exception as e:
+            print(f"[{datetime.datetime.now()}] Error compacting packed index: {str(e)}")
+        await asyncio.sleep(PACKED_INDEX_COMPACT_INTERVAL)
\ No newline at end of file
@@ -0,0 +1,38 @@
+import time
+import datetime
+from sqlalchemy.exc import OperationalError
+from app.core.database import Base, engine
+
+# Import every model so it is registered on Base.metadata
+from app.models import task_model, task_change_model, analytics_model, job_model  # noqa: F401
+
+def create_tables():
+    """
+    Create any missing tables. Run once per deployment rather than on every boot:
+
+        python -m app.core.schema
+    """
+    print(f"[{datetime.datetime.now()}] Creating database tables...")
+    Base.metadata.create_all(bind=engine)
+    print(f"[{datetime.datetime.now()}] Tables created successfully")
+
+def create_tables_when_ready(timeout: float = 60):
+    """
+    Create the tables, waiting with backoff for Postgres to accept
+    connections, e.g. while its container is still starting.
+    """
+    deadline = time.monotonic() + timeout
+    delay = 1
+    while True:
+        try:
+            create_tables()
+            return
+        except OperationalError as e:
+            if time.monotonic() + delay > deadline:
+                raise
+            print(f"[{datetime.datetime.now()}] Database not ready, retrying in {delay}s: {str(e)}")
+            time.sleep(delay)
+            delay = min(delay * 2, 10)
+
+if __name__ == "__main__":
+    create_tables_when_ready()
@@ -0,0 +1,137 @@
+import bisect
+import hashlib
+import redis
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from app.core.constants import SHARD_VIRTUAL_NODES
+from app.core.redis_clients import redis_client, shard_clients
+
+# Client-side sharding of the cache keyspace over REDIS_SHARDS.
+#
+# Only keys that are read and written one at a time are sharded: task bodies,
+# index buckets and rate-limit keys. Counters, aggregates, time series, the
+# packed index and the bucket directory are touched by multi-key commands and
+# Lua scripts, so they stay on the main node (redis_client).
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes, so adding or removing a node only
+    moves about 1/N of the keys.
+    """
+
+    def __init__(self, nodes: list[str], replicas: int = SHARD_VIRTUAL_NODES):
+        points = sorted(
+            (_hash(f"{node}#{i}"), node)
+            for node in nodes
+            for i in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def node_for(self, key: str) -> str:
+        position = bisect.bisect(self._hashes, _hash(_hash_slot_key(key)))
+        return self._nodes[position % len(self._nodes)]
+
+def _hash(value: str) -> int:
+    # CRC32 clusters short sequential keys such as bucket numbers, MD5 doesn't
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+def _hash_slot_key(key: str) -> str:
+    # Same hash tag rule as Redis Cluster: only the part inside {...} is hashed,
+    # so keys sharing a tag always land on the same node
+    start = key.find("{")
+    if start != -1:
+        end = key.find("}", start + 1)
+        if end > start + 1:
+            return key[start + 1:end]
+    return key
+
+_ring = HashRing(list(shard_clients)) if shard_clients else None
+# Every request thread may fan out to every other node at once; threads are
+# only started as needed
+_executor = ThreadPoolExecutor(
+    max_workers=settings.THREADPOOL_SIZE * len(shard_clients), thread_name_prefix="redis-shard"
+) if len(shard_clients) > 1 else None
+
+def client_for(key: str) -> redis.Redis:
+    """
+    Get the client for the node that owns a sharded key.
+    """
+    if _ring is None:
+        return redis_client
+    return shard_clients[_ring.node_for(key)]
+
+def all_clients() -> list[redis.Redis]:
+    clients = [redis_client]
+    for client in shard_clients.values():
+        if client is not redis_client:
+            clients.append(client)
+    return clients
+
+def ping_all() -> bool:
+    return all(client.ping() for client in all_clients())
+
+def run_on_each(calls: list) -> list:
+    """
+    Run callables that each talk to a different node, concurrently when there
+    is more than one. The first runs on the calling thread, so a single-node
+    call never waits for the pool.
+    """
+    if _executor is None or len(calls) <= 1:
+        return [call() for call in calls]
+    futures = [_executor.submit(call) for call in calls[1:]]
+    first = calls[0]()
+    return [first] + [future.result() for future in futures]
+
+class ShardedPipeline:
+    """
+    One pipeline per node. Commands are queued on the pipeline of the node that
+    owns their key, every node's pipeline is sent concurrently, and execute()
+    returns the replies in the order the commands were queued.
+
+    Without REDIS_SHARDS this is a single pipeline on the main node.
+    """
+
+    def __init__(self, transaction: bool = True):
+        self.transaction = transaction
+        self._pipelines: dict[int, redis.client.Pipeline] = {}
+        self._order: list[tuple[int, int]] = []
+
+    def _pipeline(self, client: redis.Redis) -> "_QueuedPipeline":
+        pipeline = self._pipelines.get(id(client))
+        if pipeline is None:
+            pipeline = self._pipelines[id(client)] = client.pipeline(transaction=self.transaction)
+        return _QueuedPipeline(self, pipeline)
+
+    def for_key(self, key: str) -> "_QueuedPipeline":
+        return self._pipeline(client_for(key))
+
+    def home(self) -> "_QueuedPipeline":
+        return self._pipeline(redis_client)
+
+    def execute(self) -> list:
+        pipelines = [pipeline for pipeline in self._pipelines.values() if len(pipeline)]
+        results = dict(zip(
+            (id(pipeline) for pipeline in pipelines),
+            run_on_each([pipeline.execute for pipeline in pipelines])
+        ))
+        return [results[pipeline_id][index] for pipeline_id, index in self._order]
+
+class _QueuedPipeline:
+    """
+    Records where each reply will appear before queueing the command.
+    """
+
+    def __init__(self, owner: ShardedPipeline, pipeline):
+        self._owner = owner
+        self._pipeline = pipeline
+
+    def __getattr__(self, name):
+        command = getattr(self._pipeline, name)
+
+        def queue(*args, **kwargs):
+            self._owner._order.append((id(self._pipeline), len(self._pipeline)))
+            command(*args, **kwargs)
+            return self
+
+        return queue
@@ -0,0 +1,266 @@
+import json
+import time
+import datetime
+from app.core.constants import (
+    TaskAggregates, EXPIRING_SOON_WINDOW, AGGREGATE_RECONCILE_INTERVAL, AGGREGATE_RECONCILE_FLAG_TTL
+)
+from app.core.redis_clients import redis_client
+
+# Live (not yet expired) tasks that have an expiry date, scored by expiry
+# timestamp and split by completion so the reaper knows which count to move.
+EXPIRY_PENDING_KEY = "tasks_expiry:pending"
+EXPIRY_COMPLETED_KEY = "tasks_expiry:completed"
+RECONCILE_LOCK_KEY = "lock:reconcile_aggregates"
+# While a reconcile is loading a recount, writes are journaled instead of
+# applied, and the ones the recount missed are replayed after the swap
+RECONCILE_FLAG_KEY = "aggregates:reconciling"
+JOURNAL_KEY = "aggregates:journal"
+
+_KEYS = [
+    f"counter:{TaskAggregates.TOTAL.value}",
+    f"counter:{TaskAggregates.COMPLETED.value}",
+    f"counter:{TaskAggregates.PENDING.value}",
+    EXPIRY_PENDING_KEY,
+    EXPIRY_COMPLETED_KEY,
+    RECONCILE_FLAG_KEY,
+    JOURNAL_KEY,
+    f"{EXPIRY_PENDING_KEY}:rebuild",
+    f"{EXPIRY_COMPLETED_KEY}:rebuild"
+]
+
+# Moves one task from its old contribution to its new one.
+# A task with an expiry date only counts as live while it is still in one of
+# the expiry sets, so a task the reaper has already removed is never
+# subtracted twice. Does nothing while the counts are missing (Redis lost its
+# data), so they aren't rebuilt from zero; the next reconciliation restores them.
+# args: id, old_exists, old_completed, old_has_expiry, new_exists, new_completed,
+#       new_expiry_ts or '', now, new version or ''
+_APPLY = """
+local function apply(a)
+    if redis.call('EXISTS', KEYS[1], KEYS[2], KEYS[3]) < 3 then
+        return
+    end
+    local id = a[1]
+    local old_counted = 0
+    if a[2] == '1' then
+        local removed = redis.call('ZREM', KEYS[4], id) + redis.call('ZREM', KEYS[5], id)
+        if a[4] == '0' or removed > 0 then
+            old_counted = 1
+        end
+    end
+    local new_counted = 0
+    if a[5] == '1' then
+        if a[7] == '' then
+            new_counted = 1
+        elseif tonumber(a[7]) > tonumber(a[8]) then
+            new_counted = 1
+            local key = KEYS[4]
+            if a[6] == '1' then key = KEYS[5] end
+            redis.call('ZADD', key, a[7], id)
+        end
+    end
+    local old_completed = old_counted * tonumber(a[3])
+    local new_completed = new_counted * tonumber(a[6])
+    local deltas = {
+        new_counted - old_counted,
+        new_completed - old_completed,
+        (new_counted - new_completed) - (old_counted - old_completed)
+    }
+    for i = 1, 3 do
+        if deltas[i] ~= 0 then
+            redis.call('INCRBY', KEYS[i], deltas[i])
+        end
+    end
+end
+"""
+
+_APPLY_SCRIPT = redis_client.register_script(_APPLY + """
+if redis.call('EXISTS', KEYS[6]) == 1 then
+    redis.call('RPUSH', KEYS[7], cjson.encode(ARGV))
+    return 0
+end
+apply(ARGV)
+return 1
+""")
+
+# Applies journaled writes. ARGV: JSON-encoded argument lists
+_REPLAY_SCRIPT = redis_client.register_script(_APPLY + """
+for i = 1, #ARGV do
+    apply(cjson.decode(ARGV[i]))
+end
+return #ARGV
+""")
+
+# Drops tasks whose expiry has passed from the expiry sets and the counts.
+# A no-op while the counts are missing or a reconcile is loading.
+# ARGV: now
+_REAP_SCRIPT = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1], KEYS[2], KEYS[3]) < 3 or redis.call('EXISTS', KEYS[6]) == 1 then
+    return {0, 0}
+end
+local pending = redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', ARGV[1])
+local completed = redis.call('ZREMRANGEBYSCORE', KEYS[5], '-inf', ARGV[1])
+if pending + completed > 0 then
+    redis.call('DECRBY', KEYS[1], pending + completed)
+    redis.call('DECRBY', KEYS[2], completed)
+    redis.call('DECRBY', KEYS[3], pending)
+end
+return {pending, completed}
+""")
+
+# ARGV: flag ttl
+_BEGIN_SCRIPT = redis_client.register_script("""
+if not redis.call('SET', KEYS[6], 1, 'NX', 'EX', ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[7], KEYS[8], KEYS[9])
+return 1
+""")
+
+# Installs the recount: the counts and the expiry sets loaded into the
+# scratch keys. Writes stay journaled until finish.
+# ARGV: total, completed, pending
+_SWAP_SCRIPT = redis_client.register_script("""
+redis.call('MSET', KEYS[1], ARGV[1], KEYS[2], ARGV[2], KEYS[3], ARGV[3])
+for i = 4, 5 do
+    if redis.call('EXISTS', KEYS[i + 4]) == 1 then
+        redis.call('RENAME', KEYS[i + 4], KEYS[i])
+    else
+        redis.call('DEL', KEYS[i])
+    end
+end
+return 1
+""")
+
+# Ends the reconcile unless writes were journaled after the first `processed`.
+# ARGV: processed
+_FINISH_SCRIPT = redis_client.register_script("""
+if redis.call('LLEN', KEYS[7]) > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call('DEL', KEYS[6], KEYS[7])
+return 1
+""")
+
+# Gives up on a reconcile, applying the journaled writes to the old values
+# when nothing was swapped in yet. ARGV: '1' to replay the journal
+_ABORT_SCRIPT = redis_client.register_script(_APPLY + """
+if ARGV[1] == '1' then
+    for _, entry in ipairs(redis.call('LRANGE', KEYS[7], 0, -1)) do
+        apply(cjson.decode(entry))
+    end
+end
+redis.call('DEL', KEYS[6], KEYS[7], KEYS[8], KEYS[9])
+return 1
+""")
+
+def _flag(value: bool) -> str:
+    return "1" if value else "0"
+
+def _epoch(value: datetime.datetime) -> float:
+    # Naive datetimes in the tasks table are UTC
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.timezone.utc)
+    return value.timestamp()
+
+def _expiry_ts(expiry_date: datetime.datetime | None) -> str:
+    return repr(_epoch(expiry_date)) if expiry_date else ""
+
+def apply_change(task_id: int, old: dict | None, new: dict | None):
+    """
+    Update the aggregates for a task going from `old` to `new`.
+    Each side is a dict with "completed", "expiry_date" and "version", or None
+    when the task doesn't exist on that side (create / delete).
+    """
+    _APPLY_SCRIPT(keys=_KEYS, args=[
+        task_id,
+        _flag(old is not None),
+        _flag(old is not None and old["completed"]),
+        _flag(old is not None and old["expiry_date"] is not None),
+        _flag(new is not None),
+        _flag(new is not None and new["completed"]),
+        _expiry_ts(new["expiry_date"]) if new is not None else "",
+        repr(time.time()),
+        str(new["version"]) if new is not None else ""
+    ])
+
+def reap_expired() -> tuple[int, int]:
+    """
+    Returns:
+        The number of (pending, completed) tasks that expired since the last run
+    """
+    pending, completed = _REAP_SCRIPT(keys=_KEYS, args=[repr(time.time())])
+    return pending, completed
+
+def get_aggregates() -> dict | None:
+    """
+    Get the aggregates from Redis, or None if any of them is missing.
+    """
+    now = time.time()
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.mget(_KEYS[:3])
+    pipe.zcount(EXPIRY_PENDING_KEY, f"({now}", now + EXPIRING_SOON_WINDOW)
+    values, expiring_soon = pipe.execute()
+    if any(value is None for value in values):
+        return None
+
+    result = {aggregate.value: int(value) for aggregate, value in zip(TaskAggregates, values)}
+    result["tasks_expiring_soon"] = expiring_soon
+    return result
+
+def begin_reconcile() -> bool:
+    """
+    Start journaling writes and clear the scratch expiry sets.
+
+    Returns:
+        False if another reconcile is already in progress
+    """
+    return bool(_BEGIN_SCRIPT(keys=_KEYS, args=[AGGREGATE_RECONCILE_FLAG_TTL]))
+
+def load_expiry(rows: list[tuple[int, bool, datetime.datetime]]):
+    """
+    Add (id, completed, expiry_date) rows to the scratch expiry sets.
+    """
+    pending = {}
+    completed = {}
+    for task_id, is_completed, expiry_date in rows:
+        (completed if is_completed else pending)[task_id] = _epoch(expiry_date)
+    pipe = redis_client.pipeline(transaction=False)
+    if pending:
+        pipe.zadd(_KEYS[7], pending)
+    if completed:
+        pipe.zadd(_KEYS[8], completed)
+    pipe.execute()
+
+def swap(counts: dict[TaskAggregates, int]):
+    """
+    Replace the counts and expiry sets with the recount.
+    """
+    _SWAP_SCRIPT(keys=_KEYS, args=[
+        counts[TaskAggregates.TOTAL], counts[TaskAggregates.COMPLETED], counts[TaskAggregates.PENDING]
+    ])
+
+def read_journal(start: int) -> list[list[str]]:
+    """
+    Get the argument lists of the writes journaled from position `start` on.
+    """
+    return [json.loads(entry) for entry in redis_client.lrange(JOURNAL_KEY, start, -1)]
+
+def replay(entries: list[list[str]]):
+    if entries:
+        _REPLAY_SCRIPT(keys=_KEYS, args=[json.dumps(entry) for entry in entries])
+
+def finish_reconcile(processed: int) -> bool:
+    """
+    Stop journaling, unless more than `processed` writes were journaled.
+    """
+    return bool(_FINISH_SCRIPT(keys=_KEYS, args=[processed]))
+
+def abort_reconcile(replay_journal: bool):
+    _ABORT_SCRIPT(keys=_KEYS, args=[_flag(replay_journal)])
+
+def acquire_reconcile_lock() -> bool:
+    """
+    Only one worker reconciles per interval; the lock simply expires.
+    """
+    return bool(redis_client.set(RECONCILE_LOCK_KEY, 1, nx=True, ex=AGGREGATE_RECONCILE_INTERVAL))
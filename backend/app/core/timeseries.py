@@ -0,0 +1,79 @@
+import time
+import numpy as np
+from app.core.constants import AnalyticsCounters, TIMESERIES_RING_MINUTES
+from app.core.redis_clients import redis_client
+
+# Seconds per bucket for each supported resolution
+RESOLUTIONS = {
+    "minute": 60,
+    "hour": 3600,
+    "day": 86400
+}
+
+# Each counter has two fixed-size arrays of big-endian u32, indexed by
+# minute % TIMESERIES_RING_MINUTES: the event count for that slot and the
+# minute (since the epoch) the count belongs to. A slot whose minute is stale
+# is reset before being incremented, so old data is overwritten in place.
+# KEYS: counts, minutes. ARGV: slot, minute
+_RECORD_SCRIPT = redis_client.register_script("""
+local offset = '#' .. ARGV[1]
+local minute = tonumber(ARGV[2])
+local current = redis.call('BITFIELD', KEYS[2], 'GET', 'u32', offset)[1]
+if current ~= minute then
+    redis.call('BITFIELD', KEYS[2], 'SET', 'u32', offset, minute)
+    redis.call('BITFIELD', KEYS[1], 'SET', 'u32', offset, 0)
+end
+return redis.call('BITFIELD', KEYS[1], 'INCRBY', 'u32', offset, 1)[1]
+""")
+
+def _keys(counter: AnalyticsCounters) -> tuple[str, str]:
+    return f"ts:{{{counter.value}}}:counts", f"ts:{{{counter.value}}}:minutes"
+
+def _ring(data: bytes | None) -> np.ndarray:
+    # The string only grows as far as the highest slot written so far
+    ring = np.zeros(TIMESERIES_RING_MINUTES, dtype=np.int64)
+    if data:
+        values = np.frombuffer(data, dtype=">u4")[:TIMESERIES_RING_MINUTES]
+        ring[:len(values)] = values
+    return ring
+
+def current_minute() -> int:
+    return int(time.time()) // 60
+
+def record(counter: AnalyticsCounters, minute: int | None = None):
+    """
+    Add one event to the current minute's bucket for a counter.
+    """
+    minute = current_minute() if minute is None else minute
+    _RECORD_SCRIPT(keys=list(_keys(counter)), args=[minute % TIMESERIES_RING_MINUTES, minute])
+
+def query(counters: list[AnalyticsCounters], start_minute: int, end_minute: int, resolution: str) -> dict:
+    """
+    Aggregate per-minute buckets in [start_minute, end_minute] into buckets of
+    the given resolution, aligned to the resolution boundary.
+
+    Cost depends only on the ring size, not on how many tasks exist.
+
+    Returns:
+        A dict with the bucket start times (unix seconds) under "timestamps"
+        and one list of values per counter name
+    """
+    step = RESOLUTIONS[resolution] // 60
+    first_bucket = start_minute - start_minute % step
+    bucket_count = (end_minute - first_bucket) // step + 1
+
+    pipe = redis_client.pipeline(transaction=False)
+    for counter in counters:
+        counts_key, minutes_key = _keys(counter)
+        pipe.get(counts_key)
+        pipe.get(minutes_key)
+    results = pipe.execute()
+
+    series = {"timestamps": ((first_bucket + np.arange(bucket_count) * step) * 60).tolist()}
+    for i, counter in enumerate(counters):
+        counts = _ring(results[2 * i])
+        minutes = _ring(results[2 * i + 1])
+        in_window = (minutes >= start_minute) & (minutes <= end_minute)
+        buckets = (minutes[in_window] - first_bucket) // step
+        series[counter.value] = np.bincount(buckets, weights=counts[in_window], minlength=bucket_count).astype(np.int64).tolist()
+    return series
@@ -1,18 +1,49 @@
 from fastapi import Request, HTTPException, status
-from app.core.redis_clients import redis_client
+from app.core import profiling, sharding
+from app.core.circuit_breaker import REDIS_UNAVAILABLE
+import threading
 import time
 
+class LocalRateLimiter:
+    """
+    Fixed-window rate limiter kept in process memory. Used while Redis is
+    unavailable, so limits apply per worker rather than globally.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._windows: dict[str, tuple[float, int]] = {}
+
+    def hit(self, key: str, window: int) -> int:
+        now = time.monotonic()
+        with self._lock:
+            started, count = self._windows.get(key, (now, 0))
+            if now - started >= window:
+                started, count = now, 0
+            self._windows[key] = (started, count + 1)
+            if len(self._windows) > self.max_keys:
+                self._windows = {k: v for k, v in self._windows.items() if now - v[0] < window}
+            return count + 1
+
+local_rate_limiter = LocalRateLimiter()
+
 # 100 requests per min per ip
 def rate_limit(request: Request):
     client_ip = request.client.host
     key = f"rate:{client_ip}"
     limit = 100
     window = 60
-    current = redis_client.incr(key)
-    if current == 1:
-        redis_client.expire(key, window)
+    with profiling.stage("rate_limit"):
+        try:
+            client = sharding.client_for(key)
+            current = client.incr(key)
+            if current == 1:
+                client.expire(key, window)
+        except REDIS_UNAVAILABLE:
+            current = local_rate_limiter.hit(key, window)
     if current > limit:
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail="Too Many Requests"
-        )
\ No newline at end of file
+        )
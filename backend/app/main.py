@@ -1,32 +1,152 @@
+from app.core import readiness
 from fastapi import FastAPI, Request
-from app.core.database import Base, engine
-from app.core import redis_utils
-from app.routers import task_router, ws_router, analytics_router
+from app.core import metrics, redis_utils, task_aggregates
+from app.core.admission import AdmissionControlMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.core.circuit_breaker import redis_breaker
+from app.core.config import settings
+from app.core.constants import (
+    AGGREGATE_REAP_INTERVAL, AGGREGATE_RECONCILE_INTERVAL, CHANGE_LOG_RETENTION, JOB_HEARTBEAT_INTERVAL
+)
+from app.core.redis_clients import configure_redis_memory
+from app.routers import task_router, ws_router, analytics_router, health_router, profiling_router, job_router
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+import anyio
 import asyncio
 import datetime
+import time
 
-# Track the Redis monitoring task to prevent garbage collection
-redis_monitor_task = None
+# Track long-running background tasks to prevent garbage collection
+background_tasks: list[asyncio.Task] = []
 
-print("ran")
+# Checks that must pass before /readyz reports ready
+READINESS_CHECKS = ("redis_configured", "counters_synced", "task_index")
 
-def create_tables():
+def _start_background_task(coro, name: str):
+    task = asyncio.create_task(coro, name=name)
+    # Add a done callback to log when the task completes (if it ever does)
+    task.add_done_callback(
+        lambda t: print(f"[{datetime.datetime.now()}] {t.get_name()} task ended: "
+                        f"{t.exception() if not t.cancelled() and t.exception() else 'No exception'}")
+    )
+    background_tasks.append(task)
+
+def _warm_up_once():
+    """
+    Run every warm-up step that hasn't completed yet. Blocking, runs in a worker thread.
+    """
+    from app.core.database import SessionLocal
+    from app.services.analytics_service import AnalyticsService
+
+    checks = readiness.status()
+
+    if settings.CREATE_TABLES_ON_STARTUP and not checks.get("tables_created"):
+        from app.core.schema import create_tables
+        create_tables()
+        readiness.mark("tables_created")
+
+    if not checks.get("redis_configured"):
+        configure_redis_memory()
+        readiness.mark("redis_configured")
+
+    db = SessionLocal()
+    try:
+        if not checks.get("counters_synced"):
+            # Sync analytics counters from database to Redis
+            AnalyticsService.ensure_counters_synced(db)
+            readiness.mark("counters_synced")
+
+        if not checks.get("task_index"):
+            if not redis_utils.index_exists():
+                redis_utils.rebuild_sorted_set_index(db)
+            readiness.mark("task_index")
+    finally:
+        db.close()
+
+async def warm_up():
+    """
+    Warm caches in the background, retrying with backoff until Redis and
+    Postgres are reachable. The app serves requests while this runs.
+    """
+    delay = 1
+    while True:
+        try:
+            await asyncio.to_thread(_warm_up_once)
+            break
+        except Exception as e:
+            print(f"[{datetime.datetime.now()}] Warm-up failed, retrying in {delay}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+    ready_seconds = readiness.seconds_since_start()
+    metrics.set_gauge("boot.ready_seconds", ready_seconds)
+    print(f"[{datetime.datetime.now()}] Caches warm, ready after {ready_seconds:.2f}s")
+
+def _reconcile_task_aggregates():
+    from app.core.database import SessionLocal
+    from app.repositories.task_repository import TaskRepository
+    from app.services.analytics_service import AnalyticsService
+
+    if not task_aggregates.acquire_reconcile_lock():
+        return
+    db = SessionLocal()
     try:
-        Base.metadata.create_all(bind=engine)
-        print("Tables created successfully")
-    except Exception as e:
-        print(f"Error creating tables: {str(e)}")
+        AnalyticsService.reconcile_task_aggregates(db)
+        # The change log only needs to reach back over a plausible Redis outage
+        pruned = TaskRepository.prune_changes(
+            db, datetime.datetime.utcnow() - datetime.timedelta(seconds=CHANGE_LOG_RETENTION)
+        )
+        if pruned:
+            print(f"[{datetime.datetime.now()}] Pruned {pruned} task change log entries")
+    finally:
+        db.close()
+
+async def maintain_task_aggregates():
+    """
+    Reap expired tasks from the aggregates and periodically recount them
+    from the database to correct drift.
+    """
+    from app.services.analytics_service import AnalyticsService
+
+    last_reconciled = None
+    while True:
+        try:
+            if last_reconciled is None or time.monotonic() - last_reconciled >= AGGREGATE_RECONCILE_INTERVAL:
+                await asyncio.to_thread(_reconcile_task_aggregates)
+                last_reconciled = time.monotonic()
+            await asyncio.to_thread(AnalyticsService.reap_expired_tasks)
+        except Exception as e:
+            print(f"[{datetime.datetime.now()}] Error maintaining task aggregates: {str(e)}")
+        await asyncio.sleep(AGGREGATE_REAP_INTERVAL)
+
+async def maintain_jobs():
+    """
+    Keep this worker's jobs alive in the database and mark jobs left behind
+    by stopped workers as interrupted.
+    """
+    from app.services.job_service import JobService
+
+    while True:
+        try:
+            await asyncio.to_thread(JobService.maintain)
+        except Exception as e:
+            print(f"[{datetime.datetime.now()}] Error maintaining jobs: {str(e)}")
+        await asyncio.sleep(JOB_HEARTBEAT_INTERVAL)
 
 def get_application() -> FastAPI:
-    create_tables()
     app = FastAPI(
         title="Real-Time Todo List",
         description="A FastAPI application with Redis caching, rate limiting, and real-time analytics.",
         version="1.0.0"
     )
 
+    # Inside admission control so queueing time isn't counted as handler time
+    app.add_middleware(ProfilingMiddleware)
+
+    # Added before CORS so shed responses still carry CORS headers
+    app.add_middleware(AdmissionControlMiddleware)
+
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["http://localhost:8080", "http://localhost:3001", "http://localhost:3000"],
@@ -35,45 +155,55 @@ def get_application() -> FastAPI:
         allow_headers=["*"],
     )
 
+    @app.middleware("http")
+    async def record_latency(request: Request, call_next):
+        started = time.perf_counter()
+        response = await call_next(request)
+        # Latency while Redis is down is tracked separately to size degraded mode
+        name = "request.degraded_ms" if redis_breaker.is_open() else "request.latency_ms"
+        metrics.observe(name, (time.perf_counter() - started) * 1000)
+        return response
+
     @app.on_event("startup")
     async def startup_event():
-        global redis_monitor_task
-        print(f"[{datetime.datetime.now()}] Application starting up - initializing Redis monitoring task")
-        
-        # Sync analytics counters from database to Redis
-        from app.core.database import SessionLocal
-        from app.services.analytics_service import AnalyticsService
-        
-        db = SessionLocal()
-        try:
-            AnalyticsService.ensure_counters_synced(db)
-        finally:
-            db.close()
-        
-        # Explicitly create the task and store it in a global variable to prevent garbage collection
-        redis_monitor_task = asyncio.create_task(redis_utils.monitor_redis())
-        # Add a done callback to log when the task completes (if it ever does)
-        redis_monitor_task.add_done_callback(
-            lambda t: print(f"[{datetime.datetime.now()}] Redis monitoring task ended: {t.exception() if t.exception() else 'No exception'}")
-        )
-        
-        print(f"[{datetime.datetime.now()}] Redis monitoring task created successfully")
+        print(f"[{datetime.datetime.now()}] Application starting up - scheduling background tasks")
+
+        # Keep the threadpool larger than the sum of the admission limits so
+        # admitted sync handlers never queue again for a thread
+        anyio.to_thread.current_default_thread_limiter().total_tokens = settings.THREADPOOL_SIZE
+
+        readiness.register(*READINESS_CHECKS)
+        if settings.CREATE_TABLES_ON_STARTUP:
+            readiness.register("tables_created")
+
+        _start_background_task(warm_up(), "Warm-up")
+        _start_background_task(redis_utils.monitor_redis(), "Redis monitoring")
+        _start_background_task(maintain_task_aggregates(), "Task aggregate maintenance")
+        _start_background_task(maintain_jobs(), "Job maintenance")
+        if settings.TASK_INDEX_ENGINE == "packed":
+            _start_background_task(redis_utils.compact_packed_index(), "Packed index compaction")
+
+        startup_seconds = readiness.seconds_since_start()
+        metrics.set_gauge("boot.startup_seconds", startup_seconds)
+        print(f"[{datetime.datetime.now()}] Accepting requests after {startup_seconds:.2f}s")
 
     @app.on_event("shutdown")
     async def shutdown_event():
-        global redis_monitor_task
         print(f"[{datetime.datetime.now()}] Application shutting down - cleaning up tasks")
-        
-        # Cancel the Redis monitoring task
-        if redis_monitor_task:
-            redis_monitor_task.cancel()
+
+        for task in background_tasks:
+            task.cancel()
             try:
-                await redis_monitor_task
+                await task
             except asyncio.CancelledError:
-                print(f"[{datetime.datetime.now()}] Redis monitoring task cancelled successfully")
+                print(f"[{datetime.datetime.now()}] {task.get_name()} task cancelled successfully")
             except Exception as e:
                 print(f"[{datetime.datetime.now()}] Error during task cancellation: {str(e)}")
-                
+        background_tasks.clear()
+
+        from app.services.job_service import JobService
+        JobService.shutdown()
+
         print(f"[{datetime.datetime.now()}] Shutdown complete")
 
     @app.exception_handler(Exception)
@@ -83,11 +213,15 @@ def get_application() -> FastAPI:
             status_code=500,
             content={"detail": "Internal server error occurred"}
         )
-    
+
     print("Including application routers")
+    app.include_router(health_router.router)
     app.include_router(task_router.router)
     app.include_router(ws_router.router)
     app.include_router(analytics_router.router)
+    app.include_router(profiling_router.router)
+    app.include_router(job_router.router)
     return app
 
-app = get_application()
\ No newline at end of file
+app = get_application()
+metrics.set_gauge("boot.import_seconds", readiness.seconds_since_start())
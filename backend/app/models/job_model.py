@@ -0,0 +1,32 @@
+from sqlalchemy import Column, String, BigInteger, Boolean, DateTime, JSON
+from app.core.database import Base
+import datetime
+
+class Job(Base):
+    """
+    A background job (populate, index rebuild, export, reconciliation) and its
+    progress, kept in the database so it survives restarts and is visible to
+    every worker.
+    """
+    __tablename__ = "jobs"
+
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    # queued, running, succeeded, failed, cancelled or interrupted
+    status = Column(String, nullable=False, index=True)
+    params = Column(JSON, nullable=False, default=dict)
+    result = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    progress_done = Column(BigInteger, default=0, nullable=False)
+    progress_total = Column(BigInteger, nullable=True)
+    cancel_requested = Column(Boolean, default=False, nullable=False)
+    # host:pid of the process running the job
+    worker = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # Heartbeat while queued or running; stale jobs were lost to a restart
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<Job(id='{self.id}', kind='{self.kind}', status='{self.status}')>"
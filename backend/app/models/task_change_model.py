@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime
+from app.core.database import Base
+import datetime
+
+class TaskChange(Base):
+    """
+    Append-only log of task writes. The sequence number is the watermark used
+    to resync the Redis index after an outage.
+    """
+    __tablename__ = "task_changes"
+
+    seq = Column(BigInteger, primary_key=True, autoincrement=True)
+    task_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    # created_at of the task, so replay can index it without a join
+    task_created_at = Column(DateTime, nullable=False)
+    changed_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False, index=True)
+
+    def __repr__(self):
+        return f"<TaskChange(seq={self.seq}, task_id={self.task_id}, op='{self.op}')>"
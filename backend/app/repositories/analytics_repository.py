@@ -76,14 +76,38 @@ class AnalyticsRepository:
             db.rollback()
             raise
     
+    @staticmethod
+    def set_counters(db: Session, values: dict) -> None:
+        """
+        Set several counters in one transaction.
+        Creates any counter that doesn't exist.
+        """
+        try:
+            existing = {
+                counter.name: counter
+                for counter in db.query(AnalyticsCounter).filter(AnalyticsCounter.name.in_(values.keys())).all()
+            }
+            for counter_name, value in values.items():
+                if counter_name in existing:
+                    existing[counter_name].value = value
+                else:
+                    db.add(AnalyticsCounter(name=counter_name, value=value))
+            db.commit()
+        except SQLAlchemyError:
+            db.rollback()
+            raise
+    
     @staticmethod
     def ensure_counters_exist(db: Session):
         """
         Ensure all counters defined in AnalyticsCounters enum exist in the database.
         """
-        for counter in AnalyticsCounters:
-            existing = db.query(AnalyticsCounter).filter(AnalyticsCounter.name == counter.value).first()
-            if not existing:
-                db.add(AnalyticsCounter(name=counter.value, value=0))
+        existing = {name for (name,) in db.query(AnalyticsCounter.name).all()}
+        missing = [counter.value for counter in AnalyticsCounters if counter.value not in existing]
+        if not missing:
+            return
+
+        for counter_name in missing:
+            db.add(AnalyticsCounter(name=counter_name, value=0))
         
         db.commit() 
\ No newline at end of file
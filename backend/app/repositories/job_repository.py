@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.models.job_model import Job
+
+# Jobs that haven't reached a final state
+ACTIVE_STATUSES = ("queued", "running")
+
+class JobRepository:
+    @staticmethod
+    def create_job(db: Session, job_id: str, kind: str, params: dict) -> Job:
+        job = Job(id=job_id, kind=kind, status="queued", params=params)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[Job]:
+        return db.query(Job).filter(Job.id == job_id).first()
+
+    @staticmethod
+    def list_jobs(db: Session, limit: int) -> List[Job]:
+        return db.query(Job).order_by(Job.created_at.desc()).limit(limit).all()
+
+    @staticmethod
+    def mark_running(db: Session, job_id: str, worker: str):
+        now = datetime.utcnow()
+        db.query(Job).filter(Job.id == job_id).update(
+            {Job.status: "running", Job.worker: worker, Job.started_at: now, Job.updated_at: now},
+            synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def update_progress(db: Session, job_id: str, done: int, total: Optional[int]) -> bool:
+        """
+        Save progress and return whether cancellation was requested.
+        """
+        values = {Job.progress_done: done, Job.updated_at: datetime.utcnow()}
+        if total is not None:
+            values[Job.progress_total] = total
+        db.query(Job).filter(Job.id == job_id).update(values, synchronize_session=False)
+        db.commit()
+        return bool(db.query(Job.cancel_requested).filter(Job.id == job_id).scalar())
+
+    @staticmethod
+    def finish(db: Session, job_id: str, status: str, result: Optional[dict] = None, error: Optional[str] = None):
+        now = datetime.utcnow()
+        db.query(Job).filter(Job.id == job_id).update(
+            {Job.status: status, Job.result: result, Job.error: error, Job.finished_at: now, Job.updated_at: now},
+            synchronize_session=False
+        )
+        db.commit()
+
+    @staticmethod
+    def request_cancel(db: Session, job_id: str) -> bool:
+        updated = db.query(Job).filter(Job.id == job_id, Job.status.in_(ACTIVE_STATUSES)).update(
+            {Job.cancel_requested: True}, synchronize_session=False
+        )
+        db.commit()
+        return updated > 0
+
+    @staticmethod
+    def heartbeat(db: Session, job_ids: List[str]) -> List[str]:
+        """
+        Refresh the heartbeat of jobs owned by this process.
+        Returns the IDs among them whose cancellation was requested.
+        """
+        db.query(Job).filter(Job.id.in_(job_ids)).update(
+            {Job.updated_at: datetime.utcnow()}, synchronize_session=False
+        )
+        db.commit()
+        return [job_id for job_id, in db.query(Job.id).filter(Job.id.in_(job_ids), Job.cancel_requested == True)]
+
+    @staticmethod
+    def mark_interrupted(db: Session, stale_before: datetime) -> int:
+        """
+        Mark active jobs whose owner stopped sending heartbeats as interrupted.
+        """
+        updated = db.query(Job).filter(Job.status.in_(ACTIVE_STATUSES), Job.updated_at < stale_before).update(
+            {Job.status: "interrupted", Job.error: "Worker stopped before the job finished",
+             Job.finished_at: datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.commit()
+        return updated
@@ -2,31 +2,142 @@ import time
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import OperationalError
 from sqlalchemy.orm.exc import StaleDataError
-from typing import Optional, List, Tuple
+from typing import Optional, List, Tuple, Iterator
+from app.core import profiling
 from app.models.task_model import Task
+from app.models.task_change_model import TaskChange
 from app.schemas.task_schema import TaskCreate, TaskUpdate
 from datetime import datetime
-from sqlalchemy import or_
+from sqlalchemy import or_, func, select, tuple_
+from sqlalchemy.engine import Connection, Row
 
 class TaskRepository:
+    @staticmethod
+    def _log_change(db: Session, task: Task, op: str):
+        # Committed in the same transaction as the write itself
+        db.add(TaskChange(task_id=task.id, op=op, task_created_at=task.created_at))
+
     @staticmethod
     def create_task(db: Session, task_data: TaskCreate) -> Task:
         new_task = Task(**task_data.dict())
         db.add(new_task)
+        db.flush()
+        TaskRepository._log_change(db, new_task, "insert")
         db.commit()
         db.refresh(new_task)
         return new_task
     
     @staticmethod
     def get_tasks_by_ids(db: Session, task_ids: List[int]) -> List[Task]:
-        return db.query(Task).filter(Task.id.in_(task_ids)).all()
+        with profiling.stage("db.get_tasks_by_ids"):
+            return db.query(Task).filter(Task.id.in_(task_ids)).all()
     
+    @staticmethod
+    def get_tasks_page(db: Session, offset: int, limit: int) -> List[Task]:
+        # Newest first, served by the created_at index
+        with profiling.stage("db.get_tasks_page"):
+            return db.query(Task).filter(
+                or_(Task.expiry_date == None, Task.expiry_date > datetime.utcnow())
+            ).order_by(Task.created_at.desc(), Task.id.desc()).offset(offset).limit(limit).all()
+
     @staticmethod
     def get_tasks_for_cache_index(db: Session) -> List[Tuple[int, datetime]]:
         return db.query(Task.id, Task.created_at).filter(
             or_(Task.expiry_date == None, Task.expiry_date > datetime.utcnow())
         ).all()
 
+    @staticmethod
+    def count_live_tasks(conn: Connection) -> Tuple[int, int]:
+        """
+        Count tasks that haven't expired. Returns (total, completed).
+        """
+        query = select(
+            func.count(Task.id),
+            func.count(Task.id).filter(Task.completed == True)
+        ).where(
+            or_(Task.expiry_date == None, Task.expiry_date > datetime.utcnow())
+        )
+        total, completed = conn.execute(query).one()
+        return total, completed
+
+    @staticmethod
+    def count_expiring_tasks(db: Session, until: datetime) -> int:
+        # Range scan on the expiry_date index
+        return db.query(func.count(Task.id)).filter(
+            Task.completed == False,
+            Task.expiry_date > datetime.utcnow(),
+            Task.expiry_date <= until
+        ).scalar()
+
+    @staticmethod
+    def stream_live_tasks_with_expiry(conn: Connection, batch_size: int) -> Iterator[List[Row]]:
+        """
+        Stream (id, completed, expiry_date) of live tasks that have an expiry
+        date from a server-side cursor, in lists of `batch_size` rows.
+        """
+        query = select(Task.id, Task.completed, Task.expiry_date).where(Task.expiry_date > datetime.utcnow())
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        yield from result.partitions()
+
+    @staticmethod
+    def get_task_versions(conn: Connection, task_ids: List[int]) -> dict:
+        """
+        Map each of the given task IDs that exists to its version.
+        """
+        if not task_ids:
+            return {}
+        return dict(conn.execute(select(Task.id, Task.version).where(Task.id.in_(task_ids))).all())
+
+    @staticmethod
+    def stream_tasks(
+        conn: Connection,
+        batch_size: int,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        completed: Optional[bool] = None,
+        after: Optional[Tuple[datetime, int]] = None
+    ) -> Iterator[Row]:
+        """
+        Stream every task (expired ones included) oldest first from a
+        server-side cursor, `batch_size` rows per round trip.
+        `after` is the (created_at, id) of the last row already read.
+        """
+        query = select(
+            Task.id, Task.title, Task.description, Task.completed, Task.expiry_date, Task.created_at
+        ).order_by(Task.created_at, Task.id)
+        if created_from is not None:
+            query = query.where(Task.created_at >= created_from)
+        if created_to is not None:
+            query = query.where(Task.created_at < created_to)
+        if completed is not None:
+            query = query.where(Task.completed == completed)
+        if after is not None:
+            query = query.where(tuple_(Task.created_at, Task.id) > tuple_(*after))
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        yield from result
+
+    @staticmethod
+    def get_latest_change_seq(db: Session) -> int:
+        return db.query(func.max(TaskChange.seq)).scalar() or 0
+
+    @staticmethod
+    def get_last_change_seq_before(db: Session, before: datetime) -> int:
+        return db.query(func.max(TaskChange.seq)).filter(TaskChange.changed_at < before).scalar() or 0
+
+    @staticmethod
+    def get_oldest_change_seq(db: Session) -> Optional[int]:
+        return db.query(func.min(TaskChange.seq)).scalar()
+
+    @staticmethod
+    def get_changes_since(db: Session, seq: int, limit: int) -> List[TaskChange]:
+        return db.query(TaskChange).filter(TaskChange.seq > seq).order_by(TaskChange.seq).limit(limit).all()
+
+    @staticmethod
+    def prune_changes(db: Session, before: datetime) -> int:
+        deleted = db.query(TaskChange).filter(TaskChange.changed_at < before).delete(synchronize_session=False)
+        db.commit()
+        return deleted
+
     @staticmethod
     def update_task(db: Session, task: Task, updates: TaskUpdate) -> Task:
         max_retries = 3
@@ -34,6 +145,7 @@ class TaskRepository:
             try:
                 for field, value in updates.dict(exclude_unset=True).items():
                     setattr(task, field, value)
+                TaskRepository._log_change(db, task, "update")
                 db.commit()
                 db.refresh(task)
                 return task
@@ -56,6 +168,7 @@ class TaskRepository:
         max_retries = 3
         for attempt in range(max_retries):
             try:
+                TaskRepository._log_change(db, task, "delete")
                 db.delete(task)
                 db.commit()
                 return
@@ -1,5 +1,7 @@
-from fastapi import APIRouter, Depends
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
+from app.core.constants import AnalyticsCounters, TIMESERIES_RING_MINUTES
 from app.dependencies import rate_limit
 from app.core.database import get_db
 from app.services.analytics_service import AnalyticsService
@@ -9,7 +11,28 @@ router = APIRouter(prefix="/analytics", tags=["Analytics"], dependencies=[Depend
 @router.get("/")
 def get_analytics(db: Session = Depends(get_db)):
     """
-    Get all analytics counters.
+    Get all analytics counters and task state aggregates.
     Will automatically repopulate Redis cache with database values if needed.
     """
-    return AnalyticsService.get_all_counters(db)
\ No newline at end of file
+    return {
+        **AnalyticsService.get_all_counters(db),
+        **AnalyticsService.get_task_aggregates(db)
+    }
+
+@router.get("/timeseries")
+def get_timeseries(
+    counter: Optional[AnalyticsCounters] = None,
+    minutes: int = Query(60, ge=1, le=TIMESERIES_RING_MINUTES),
+    resolution: Literal["minute", "hour", "day"] = "minute"
+):
+    """
+    Get counter activity over the last `minutes` minutes (up to 7 days),
+    bucketed by minute, hour or day. Returns every counter unless one is given.
+    """
+    series = AnalyticsService.get_timeseries(counter, minutes, resolution)
+    if series is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Time series are unavailable while Redis is down"
+        )
+    return series
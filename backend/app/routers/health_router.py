@@ -0,0 +1,30 @@
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from app.core import metrics, readiness
+
+router = APIRouter(tags=["Health"])
+
+@router.get("/healthz")
+def healthz():
+    """
+    Liveness probe. The process is up and serving requests.
+    """
+    return {"status": "ok", "uptime_seconds": readiness.seconds_since_start()}
+
+@router.get("/readyz")
+def readyz():
+    """
+    Readiness probe. Returns 503 until the background warm-up has finished.
+    """
+    ready = readiness.is_ready()
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"ready": ready, "checks": readiness.status()}
+    )
+
+@router.get("/metrics")
+def get_metrics():
+    """
+    In-process metrics for this worker.
+    """
+    return metrics.snapshot()
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import List
+from app.core.database import get_db
+from app.schemas.job_schema import JobCreate, JobOut
+from app.services.job_service import JobService
+from app.dependencies import rate_limit
+
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Jobs"],
+    dependencies=[Depends(rate_limit)]
+)
+
+@router.post("/", response_model=JobOut, status_code=status.HTTP_202_ACCEPTED)
+def create_job(job_data: JobCreate, db: Session = Depends(get_db)):
+    """
+    Queue a background job.
+
+    - populate: {"count": int, "seed": int, "workers": int, "build_index": bool}
+    - rebuild_index: no params
+    - export: {"format": "ndjson" | "csv", "created_from": iso date, "created_to": iso date, "completed": bool}
+    - reconcile: no params
+    """
+    try:
+        return JobService.submit(db, job_data.kind, job_data.params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+@router.get("/", response_model=List[JobOut])
+def list_jobs(db: Session = Depends(get_db)):
+    return JobService.list_jobs(db)
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    job = JobService.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+    return job
+
+@router.post("/{job_id}/cancel", response_model=JobOut)
+def cancel_job(job_id: str, db: Session = Depends(get_db)):
+    if not JobService.cancel(db, job_id):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Job not found or already finished"
+        )
+    return JobService.get_job(db, job_id)
@@ -0,0 +1,31 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from app.core import profiling
+from app.dependencies import rate_limit
+
+router = APIRouter(prefix="/profiling", tags=["Profiling"], dependencies=[Depends(rate_limit)])
+
+@router.get("/")
+def get_profiling():
+    """
+    Current profiling switches and the most recent request profiles for this worker.
+    """
+    return {
+        "config": profiling.get_config(),
+        "recent": list(profiling.recent_profiles)
+    }
+
+@router.put("/")
+def configure_profiling(
+    sample_rate: Optional[float] = Query(None, ge=0, le=1),
+    header_enabled: Optional[bool] = None,
+    capture_stacks: Optional[bool] = None
+):
+    """
+    Change the profiling switches of this worker at runtime.
+
+    - sample_rate: fraction of requests to profile (0 disables sampling)
+    - header_enabled: also profile requests sent with `X-Profile: 1`
+    - capture_stacks: dump stack samples of profiled requests to PROFILE_DIR
+    """
+    return profiling.configure(sample_rate, header_enabled, capture_stacks)
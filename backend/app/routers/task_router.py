@@ -1,19 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.orm.exc import StaleDataError
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
 from app.core.database import get_db
 from app.schemas.task_schema import TaskCreate, TaskUpdate, TaskOut
 from app.services.task_service import TaskService
+from app.services.export_service import ExportService, MEDIA_TYPES
+from app.services.job_service import JobService
+from app.core.constants import POPULATE_WORKERS, POPULATE_MAX_WORKERS
 from app.dependencies import rate_limit
 import json
 import datetime
-import random
-import time
-import asyncio
-from app.repositories.task_repository import TaskRepository
-from app.core.redis_clients import pubsub_redis
-from app.core.config import settings
+from app.core import redis_utils
 
 router = APIRouter(
     prefix="/tasks",
@@ -30,12 +29,45 @@ def create_pub_msg(task, event_type: str):
 @router.post("/", response_model=TaskOut)
 def create_task(task_data: TaskCreate, db: Session = Depends(get_db)):
     new_task = TaskService.create_task(db, task_data)
-    pubsub_redis.publish(settings.TASKS_CHANNEL, create_pub_msg(new_task, "created")) 
+    redis_utils.publish_event(create_pub_msg(new_task, "created"))
     return new_task
 
+# Declared before /{page} so "export" isn't parsed as a page number
+@router.get("/export")
+def export_tasks(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    created_from: Optional[datetime.datetime] = None,
+    created_to: Optional[datetime.datetime] = None,
+    completed: Optional[bool] = None,
+    after_created_at: Optional[datetime.datetime] = None,
+    after_id: Optional[int] = None
+):
+    """
+    Stream every task, oldest first, as NDJSON or CSV straight from Postgres.
+
+    - Optionally filter by a created_at range [created_from, created_to) and by completed.
+    - To resume an interrupted export, pass the created_at and id of the last
+      row received as after_created_at and after_id.
+    """
+    if (after_created_at is None) != (after_id is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="after_created_at and after_id must be given together"
+        )
+    after = (after_created_at, after_id) if after_id is not None else None
+    return StreamingResponse(
+        ExportService.export_tasks(format, created_from, created_to, completed, after),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="tasks.{format}"'}
+    )
+
 @router.get("/{page}", response_model=List[TaskOut])
 def get_tasks_by_page(page: int, db: Session = Depends(get_db)):
     print(f"Getting tasks for page {page}")
+    # The newest pages are served as pre-serialized blobs when available
+    blob = TaskService.get_head_page(db, page)
+    if blob is not None:
+        return Response(content=blob, media_type="application/json")
     return TaskService.get_tasks_page(db, page)
 
 @router.put("/{task_id}", response_model=TaskOut)
@@ -47,7 +79,7 @@ def update_task(task_id: int, updates: TaskUpdate, db: Session = Depends(get_db)
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Task not found"
             )
-        pubsub_redis.publish(settings.TASKS_CHANNEL, create_pub_msg(updated_task, "updated"))
+        redis_utils.publish_event(create_pub_msg(updated_task, "updated"))
         return updated_task
     except StaleDataError:
         raise HTTPException(
@@ -64,7 +96,7 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Task not found"
             )
-        pubsub_redis.publish(settings.TASKS_CHANNEL, json.dumps({"id": task_id, "event": "deleted"}))
+        redis_utils.publish_event(json.dumps({"id": task_id, "event": "deleted"}))
         return {"detail": "Task deleted successfully"}
     except StaleDataError:
         raise HTTPException(
@@ -72,109 +104,37 @@ def delete_task(task_id: int, db: Session = Depends(get_db)):
             detail="Delete conflict: the task was modified by another request. Please refresh and try again."
         )
 
-# Function to generate tasks in batches
-async def _generate_tasks_in_background(total: int, batch_size: int):
-    """Generate tasks in batches to avoid overloading the database"""
-    db = next(get_db())
-    
-    # Sample titles and descriptions for variety
-    titles = [
-        "Complete project", "Review code", "Write documentation", 
-        "Test functionality", "Fix bug", "Implement feature", 
-        "Attend meeting", "Send email", "Schedule call",
-        "Research solution", "Update database", "Deploy changes"
-    ]
-    
-    descriptions = [
-        "This needs to be done ASAP", "Low priority task", "Medium priority task",
-        "High priority task", "Follow up required", "No rush on this one",
-        "Part of the Q2 project", "Needs review from team", "Important client request",
-        "Internal improvement", "Technical debt", "Long-term project"
-    ]
-    
-    # Track progress
-    created_count = 0
-    start_time = time.time()
-    last_log_time = start_time
-    
-    # Generate tasks in batches
-    for batch_num in range(0, total, batch_size):
-        batch_tasks = []
-        
-        # Only create as many as needed to reach the total
-        current_batch_size = min(batch_size, total - created_count)
-        
-        for i in range(current_batch_size):
-            # Create task with random title and description
-            task_data = TaskCreate(
-                title=f"{random.choice(titles)} {created_count + i + 1}",
-                description=random.choice(descriptions),
-                completed=random.random() > 0.7,  # 30% chance of being completed
-                expiry_date=None if random.random() > 0.2 else (
-                    datetime.datetime.utcnow() + 
-                    datetime.timedelta(days=random.randint(1, 30))
-                )  # 20% chance of having expiry date
-            )
-            
-            # Directly use repository to bypass Redis for bulk operations
-            task = TaskRepository.create_task(db, task_data)
-            batch_tasks.append(task)
-            
-        # Commit the batch
-        db.commit()
-        
-        # Update counter
-        created_count += len(batch_tasks)
-        
-        # Log progress every 10 seconds or at the end
-        current_time = time.time()
-        if current_time - last_log_time >= 10 or created_count >= total:
-            elapsed = current_time - start_time
-            tasks_per_second = created_count / elapsed if elapsed > 0 else 0
-            print(f"Created {created_count}/{total} tasks ({(created_count/total)*100:.2f}%) "
-                  f"in {elapsed:.2f}s ({tasks_per_second:.2f} tasks/sec)")
-            last_log_time = current_time
-        
-        # Small pause to avoid overloading the system
-        if batch_num + batch_size < total:
-            await asyncio.sleep(0.01)
-    
-    end_time = time.time()
-    total_time = end_time - start_time
-    print(f"Task generation complete! Created {created_count} tasks in {total_time:.2f} seconds "
-          f"({created_count/total_time:.2f} tasks/sec)")
-
 @router.post("/populate/{count}")
-async def populate_tasks(count: int, background_tasks: BackgroundTasks):
+def populate_tasks(
+    count: int,
+    seed: Optional[int] = None,
+    workers: int = Query(POPULATE_WORKERS, ge=1, le=POPULATE_MAX_WORKERS),
+    build_index: bool = True,
+    db: Session = Depends(get_db)
+):
     """
     Populate the database with a specified number of tasks.
     
     - Use with caution! This will generate a large number of tasks.
-    - Tasks are created in batches to avoid overloading the database.
-    - Default batch size is 1000 tasks at a time.
+    - Tasks are generated in batches of 20,000 and loaded with COPY by `workers` processes.
+    - Pass a `seed` to generate the same dataset again.
+    - With `build_index` the Redis task index is built in the same pass; otherwise it is rebuilt at the end.
+    - Runs as a populate job; follow it with GET /jobs/{job_id}.
     
     Example: POST /tasks/populate/1000000 to create 1 million tasks
     """
-    if count <= 0:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Count must be greater than 0"
-        )
-    
-    if count > 10000000:  # 10 million limit
+    params = {"count": count, "seed": seed, "workers": workers, "build_index": build_index}
+    try:
+        job = JobService.submit(db, "populate", params)
+    except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Cannot create more than 10 million tasks at once"
+            detail=str(e)
         )
     
-    # Determine batch size based on count
-    batch_size = min(1000, count)
-    
-    # Start the task generation in the background
-    background_tasks.add_task(_generate_tasks_in_background, count, batch_size)
-    
     return {
         "message": f"Started generating {count} tasks in the background",
-        "details": "This process will continue in the background and may take several minutes to complete. Check server logs for progress.",
-        "estimated_time": f"~{count/50000:.2f} minutes (estimated)"
-    }
\ No newline at end of file
+        "details": f"Follow progress at /jobs/{job.id}",
+        "job_id": job.id,
+        "estimated_time": f"~{count/100000/60:.2f} minutes (estimated)"
+    }
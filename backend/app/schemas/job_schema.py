@@ -0,0 +1,30 @@
+from pydantic import BaseModel
+from typing import Optional, Literal
+from datetime import datetime
+
+JobKind = Literal["populate", "rebuild_index", "export", "reconcile"]
+
+class JobCreate(BaseModel):
+    kind: JobKind
+    params: dict = {}
+
+class JobOut(BaseModel):
+    id: str
+    kind: str
+    status: str
+    params: dict
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    progress_done: int
+    progress_total: Optional[int] = None
+    cancel_requested: bool
+    worker: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Items per second since the job started
+    throughput: Optional[float] = None
+    eta_seconds: Optional[float] = None
+
+    class Config:
+        from_attributes = True
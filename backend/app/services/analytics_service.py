@@ -1,10 +1,62 @@
+import math
+from sqlalchemy.engine import Connection
 from sqlalchemy.orm import Session
 from app.repositories.analytics_repository import AnalyticsRepository
-from app.core.constants import AnalyticsCounters
+from app.repositories.task_repository import TaskRepository
+from app.core import task_aggregates, timeseries
+from app.core.constants import (
+    AnalyticsCounters, TaskAggregates, TIMESERIES_RING_MINUTES, EXPIRING_SOON_WINDOW, PAGE_SIZE,
+    AGGREGATE_RECONCILE_BATCH_SIZE
+)
+from app.core.database import engine
+from app.core.circuit_breaker import REDIS_UNAVAILABLE
 from app.core.redis_utils import get_counter as redis_get_counter
 from app.core.redis_utils import set_counter as redis_set_counter
+from app.core.redis_utils import set_counters as redis_set_counters
 from app.core.redis_utils import increment_counter as redis_increment_counter
 import datetime
+import threading
+
+# One recount per worker when the aggregates have to be repopulated
+_repopulate_lock = threading.Lock()
+
+def _replay_unseen_writes(conn: Connection):
+    """
+    Drain the journal of writes made during a reconcile, replaying those the
+    snapshot on `conn` didn't include. A create or update was included if the
+    snapshot holds the task at that version or later, a delete if the task is
+    gone. Once one write to a task is replayed, later ones to it are too.
+    """
+    replayed_ids = set()
+    processed = 0
+    while True:
+        entries = task_aggregates.read_journal(processed)
+        versions = TaskRepository.get_task_versions(conn, list({int(entry[0]) for entry in entries}))
+        unseen = []
+        for entry in entries:
+            task_id, version = int(entry[0]), entry[8]
+            if task_id in replayed_ids:
+                seen = False
+            elif version:
+                seen = versions.get(task_id, 0) >= int(version)
+            else:
+                seen = task_id not in versions
+            if not seen:
+                replayed_ids.add(task_id)
+                unseen.append(entry)
+        task_aggregates.replay(unseen)
+        processed += len(entries)
+        if task_aggregates.finish_reconcile(processed):
+            if processed:
+                print(f"[{datetime.datetime.now()}] Replayed {len(replayed_ids)} tasks written during reconcile")
+            return
+
+def _abort_reconcile(replay_journal: bool):
+    try:
+        task_aggregates.abort_reconcile(replay_journal)
+    except REDIS_UNAVAILABLE:
+        # The flag expires on its own
+        pass
 
 class AnalyticsService:
     """
@@ -18,7 +70,10 @@ class AnalyticsService:
         Will repopulate cache if value is fetched from database.
         """
         # Try to get from Redis first
-        redis_value = redis_get_counter(counter)
+        try:
+            redis_value = redis_get_counter(counter)
+        except REDIS_UNAVAILABLE:
+            return AnalyticsRepository.get_counter(db, counter.value)
         
         if redis_value is not None:
             # Return cached value if it exists
@@ -29,8 +84,11 @@ class AnalyticsService:
         db_value = AnalyticsRepository.get_counter(db, counter.value)
         
         # Repopulate cache with database value
-        redis_set_counter(counter, db_value)
-        print(f"[{datetime.datetime.now()}] Repopulated Redis cache for counter {counter.value} with value {db_value}")
+        try:
+            redis_set_counter(counter, db_value)
+            print(f"[{datetime.datetime.now()}] Repopulated Redis cache for counter {counter.value} with value {db_value}")
+        except REDIS_UNAVAILABLE:
+            pass
         
         return db_value
     
@@ -47,24 +105,186 @@ class AnalyticsService:
             
         return result
     
+    @staticmethod
+    def get_task_aggregates(db: Session) -> dict:
+        """
+        Get total, completed, pending and expiring-soon task counts plus the
+        page count. Served from Redis; falls back to the last reconciled values
+        stored in the database.
+        """
+        try:
+            aggregates = task_aggregates.get_aggregates()
+        except REDIS_UNAVAILABLE:
+            aggregates = None
+            redis_available = False
+        else:
+            redis_available = True
+
+        if aggregates is None:
+            # Recount rather than restore the stored counts, which would leave
+            # the expiry sets empty. Other requests meanwhile use the stored counts.
+            if redis_available and _repopulate_lock.acquire(blocking=False):
+                try:
+                    print(f"[{datetime.datetime.now()}] Task aggregates missing from Redis, reconciling")
+                    return AnalyticsService.reconcile_task_aggregates(db)
+                finally:
+                    _repopulate_lock.release()
+
+            stored = AnalyticsRepository.get_all_counters(db)
+            if any(aggregate.value not in stored for aggregate in TaskAggregates):
+                # Never reconciled yet, count once now
+                return AnalyticsService.reconcile_task_aggregates(db)
+
+            counts = {aggregate: stored[aggregate.value] for aggregate in TaskAggregates}
+            aggregates = {aggregate.value: value for aggregate, value in counts.items()}
+            aggregates["tasks_expiring_soon"] = TaskRepository.count_expiring_tasks(
+                db, datetime.datetime.utcnow() + datetime.timedelta(seconds=EXPIRING_SOON_WINDOW)
+            )
+
+        aggregates["page_count"] = math.ceil(aggregates[TaskAggregates.TOTAL.value] / PAGE_SIZE)
+        return aggregates
+
+    @staticmethod
+    def apply_task_change(task_id: int, old: dict | None, new: dict | None):
+        """
+        Apply the aggregate deltas for one task write. Each side holds the
+        task's "completed", "expiry_date" and "version", or is None for
+        create / delete.
+        Drift from writes made while Redis is unavailable is fixed by the next
+        reconciliation.
+        """
+        try:
+            task_aggregates.apply_change(task_id, old, new)
+        except REDIS_UNAVAILABLE:
+            print(f"[{datetime.datetime.now()}] Redis unavailable, task aggregates will be corrected on next reconciliation")
+
+    @staticmethod
+    def reap_expired_tasks():
+        """
+        Move tasks whose expiry date has passed out of the aggregates.
+        """
+        pending, completed = task_aggregates.reap_expired()
+        if pending or completed:
+            print(f"[{datetime.datetime.now()}] Reaped {pending + completed} expired tasks from aggregates")
+
+    @staticmethod
+    def reconcile_task_aggregates(db: Session) -> dict:
+        """
+        Recount the aggregates from the tasks table to correct any drift, and
+        store the result in both Redis and the database.
+
+        The recount reads one repeatable-read snapshot, streaming the expiry
+        rows into scratch sets that are swapped in at the end. Writes made
+        meanwhile are journaled in Redis; after the swap, those the snapshot
+        didn't include (judged by task version) are replayed on top.
+        """
+        print(f"[{datetime.datetime.now()}] Reconciling task aggregates...")
+        try:
+            # Before the snapshot is taken, so no write falls between the two
+            loading = task_aggregates.begin_reconcile()
+        except REDIS_UNAVAILABLE:
+            loading = False
+        soon = datetime.datetime.utcnow() + datetime.timedelta(seconds=EXPIRING_SOON_WINDOW)
+        expiring_soon = 0
+
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="REPEATABLE READ")
+            try:
+                total, completed = TaskRepository.count_live_tasks(conn)
+                counts = {
+                    TaskAggregates.TOTAL: total,
+                    TaskAggregates.COMPLETED: completed,
+                    TaskAggregates.PENDING: total - completed
+                }
+                for rows in TaskRepository.stream_live_tasks_with_expiry(conn, AGGREGATE_RECONCILE_BATCH_SIZE):
+                    expiring_soon += sum(
+                        1 for _, is_completed, expiry_date in rows if not is_completed and expiry_date <= soon
+                    )
+                    if loading:
+                        try:
+                            task_aggregates.load_expiry(rows)
+                        except REDIS_UNAVAILABLE:
+                            loading = False
+                            _abort_reconcile(replay_journal=True)
+            except Exception:
+                if loading:
+                    _abort_reconcile(replay_journal=True)
+                raise
+
+            if loading:
+                swapped = False
+                try:
+                    task_aggregates.swap(counts)
+                    swapped = True
+                    _replay_unseen_writes(conn)
+                except Exception as e:
+                    # After the swap the journal can't be applied blindly, so
+                    # writes the snapshot missed wait for the next reconcile
+                    _abort_reconcile(replay_journal=not swapped)
+                    if not isinstance(e, REDIS_UNAVAILABLE):
+                        raise
+
+        AnalyticsRepository.set_counters(db, {aggregate.value: value for aggregate, value in counts.items()})
+        aggregates = {aggregate.value: value for aggregate, value in counts.items()}
+        aggregates["tasks_expiring_soon"] = expiring_soon
+        aggregates["page_count"] = math.ceil(total / PAGE_SIZE)
+        print(f"[{datetime.datetime.now()}] Task aggregates reconciled. Values: {aggregates}")
+        return aggregates
+
+    @staticmethod
+    def get_timeseries(counter: AnalyticsCounters | None, minutes: int, resolution: str) -> dict | None:
+        """
+        Get per-minute counter activity over the last `minutes` minutes, rolled
+        up to the requested resolution. Reads only the fixed-size Redis rings,
+        so returns None while Redis is unavailable.
+        """
+        minutes = min(minutes, TIMESERIES_RING_MINUTES)
+        end_minute = timeseries.current_minute()
+        start_minute = end_minute - minutes + 1
+        counters = [counter] if counter else list(AnalyticsCounters)
+
+        try:
+            series = timeseries.query(counters, start_minute, end_minute, resolution)
+        except REDIS_UNAVAILABLE:
+            return None
+        timestamps = series.pop("timestamps")
+        return {
+            "resolution": resolution,
+            "start": datetime.datetime.utcfromtimestamp(start_minute * 60).isoformat(),
+            "end": datetime.datetime.utcfromtimestamp((end_minute + 1) * 60).isoformat(),
+            "points": [
+                {
+                    "timestamp": datetime.datetime.utcfromtimestamp(ts).isoformat(),
+                    **{name: values[i] for name, values in series.items()}
+                }
+                for i, ts in enumerate(timestamps)
+            ]
+        }
+
     @staticmethod
     def increment_counter(db: Session, counter: AnalyticsCounters) -> int:
         """
         Increment counter by 1 in both Redis and database, ensuring they stay in sync.
         Returns new counter value.
         """
-        # Increment in Redis and publish update
-        redis_value = redis_increment_counter(counter)
+        # Increment in Redis and publish update. The database stays the source
+        # of truth while Redis is unavailable.
+        try:
+            redis_value = redis_increment_counter(counter)
+        except REDIS_UNAVAILABLE:
+            redis_value = None
         
         # Increment in database
         db_value = AnalyticsRepository.increment_counter(db, counter.value)
         print(f"[{datetime.datetime.now()}] Incremented counter {counter.value} in database to {db_value}")
         
         # If Redis and DB values are out of sync, use DB value as source of truth
-        if redis_value != db_value:
+        if redis_value is not None and redis_value != db_value:
             print(f"[{datetime.datetime.now()}] Redis counter {counter.value} out of sync with database. Redis: {redis_value}, DB: {db_value}. Fixing...")
-            redis_set_counter(counter, db_value)
-            redis_value = db_value
+            try:
+                redis_set_counter(counter, db_value)
+            except REDIS_UNAVAILABLE:
+                pass
             
         return db_value
     
@@ -82,12 +302,11 @@ class AnalyticsService:
         # Get all counters from database (source of truth)
         db_counters = AnalyticsRepository.get_all_counters(db)
         
-        # Update Redis cache for all counters
-        for counter_name, counter_value in db_counters.items():
-            # Find the corresponding enum
-            for counter_enum in AnalyticsCounters:
-                if counter_enum.value == counter_name:
-                    redis_set_counter(counter_enum, counter_value)
-                    break
+        # Update Redis cache for all counters in one round trip
+        redis_set_counters({
+            counter: db_counters[counter.value]
+            for counter in AnalyticsCounters
+            if counter.value in db_counters
+        })
         
         print(f"[{datetime.datetime.now()}] Analytics counters synced. Values: {db_counters}") 
\ No newline at end of file
@@ -0,0 +1,262 @@
+import os
+import time
+import uuid
+import socket
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.constants import (
+    JOB_CONCURRENCY, JOB_PROGRESS_INTERVAL, JOB_STALE_AFTER, JOB_LIST_LIMIT,
+    POPULATE_WORKERS, POPULATE_MAX_WORKERS
+)
+from app.core.database import SessionLocal
+from app.models.job_model import Job
+from app.repositories.job_repository import JobRepository
+from app.schemas.job_schema import JobOut
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+class JobCancelled(Exception):
+    """
+    Raised inside a job when its cancellation was requested.
+    """
+
+class JobContext:
+    """
+    Handed to a running job to report progress. Progress is saved at most once
+    per JOB_PROGRESS_INTERVAL, and reporting is where a cancelled job stops.
+    """
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.cancel_event = threading.Event()
+        self.done = 0
+        self.total: Optional[int] = None
+        self._last_saved = 0.0
+
+    def progress(self, done: int, total: Optional[int] = None):
+        self.done = done
+        if total is not None:
+            self.total = total
+        if time.monotonic() - self._last_saved >= JOB_PROGRESS_INTERVAL:
+            self.save()
+        if self.cancel_event.is_set():
+            raise JobCancelled()
+
+    def save(self):
+        self._last_saved = time.monotonic()
+        db = SessionLocal()
+        try:
+            if JobRepository.update_progress(db, self.job_id, self.done, self.total):
+                self.cancel_event.set()
+        finally:
+            db.close()
+
+def _run_populate(ctx: JobContext, db: Session, params: dict) -> dict:
+    from app.services.populate_service import PopulateService
+    return PopulateService.populate(
+        params["count"], params.get("seed"), params.get("workers", POPULATE_WORKERS),
+        params.get("build_index", True), on_progress=ctx.progress
+    )
+
+def _run_rebuild_index(ctx: JobContext, db: Session, params: dict) -> dict:
+    from app.core import redis_utils
+    ctx.progress(0, 1)
+    redis_utils.rebuild_sorted_set_index(db)
+    # Not through progress(), a finished rebuild can't be cancelled any more
+    ctx.done = 1
+    return {}
+
+def _run_reconcile(ctx: JobContext, db: Session, params: dict) -> dict:
+    from app.services.analytics_service import AnalyticsService
+    return AnalyticsService.reconcile_task_aggregates(db)
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime.datetime]:
+    return datetime.datetime.fromisoformat(value) if value else None
+
+def _run_export(ctx: JobContext, db: Session, params: dict) -> dict:
+    from app.services.export_service import ExportService
+    fmt = params.get("format", "ndjson")
+    os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+    path = os.path.join(settings.EXPORT_DIR, f"tasks-{ctx.job_id}.{fmt}")
+    chunks = ExportService.export_tasks(
+        fmt, _parse_datetime(params.get("created_from")), _parse_datetime(params.get("created_to")),
+        params.get("completed"), on_progress=ctx.progress
+    )
+    with open(path, "w", newline="") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return {"path": path, "rows": ctx.done}
+
+JOB_HANDLERS = {
+    "populate": _run_populate,
+    "rebuild_index": _run_rebuild_index,
+    "export": _run_export,
+    "reconcile": _run_reconcile
+}
+
+# One pool per kind, sized by JOB_CONCURRENCY; jobs beyond the limit wait queued
+_executors = {
+    kind: ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"job-{kind}")
+    for kind, limit in JOB_CONCURRENCY.items()
+}
+# Jobs queued or running in this process
+_local_jobs: dict[str, JobContext] = {}
+_local_lock = threading.Lock()
+
+def _is_int(value) -> bool:
+    # bool is an int subclass, but true/false isn't a valid count
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def _validate(kind: str, params: dict):
+    """
+    Check the params before the job is stored, so bad input is a 400
+    rather than a failed job. Raises ValueError.
+    """
+    if kind == "populate":
+        count = params.get("count")
+        if not _is_int(count) or count <= 0:
+            raise ValueError("Count must be greater than 0")
+        if count > 10000000:  # 10 million limit
+            raise ValueError("Cannot create more than 10 million tasks at once")
+        workers = params.get("workers", POPULATE_WORKERS)
+        if not _is_int(workers) or not 1 <= workers <= POPULATE_MAX_WORKERS:
+            raise ValueError(f"Workers must be between 1 and {POPULATE_MAX_WORKERS}")
+        seed = params.get("seed")
+        if seed is not None and (not _is_int(seed) or seed < 0):
+            raise ValueError("Seed must be a non-negative integer")
+        if not isinstance(params.get("build_index", True), bool):
+            raise ValueError("build_index must be true or false")
+    elif kind == "export":
+        if params.get("format", "ndjson") not in ("ndjson", "csv"):
+            raise ValueError("Format must be ndjson or csv")
+        if params.get("completed") is not None and not isinstance(params["completed"], bool):
+            raise ValueError("completed must be true or false")
+        for field in ("created_from", "created_to"):
+            value = params.get(field)
+            if value is not None and not isinstance(value, str):
+                raise ValueError(f"{field} must be an ISO 8601 date")
+            try:
+                _parse_datetime(value)
+            except ValueError:
+                raise ValueError(f"{field} must be an ISO 8601 date")
+
+def _to_out(job: Job) -> JobOut:
+    out = JobOut.from_orm(job)
+    if job.started_at and job.progress_done:
+        elapsed = ((job.finished_at or datetime.datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            out.throughput = job.progress_done / elapsed
+            if job.progress_total and job.status == "running":
+                out.eta_seconds = (job.progress_total - job.progress_done) / out.throughput
+    return out
+
+class JobService:
+    @staticmethod
+    def submit(db: Session, kind: str, params: dict) -> JobOut:
+        """
+        Persist a job and queue it on this worker's pool for its kind.
+        Raises ValueError for invalid parameters.
+        """
+        _validate(kind, params)
+        job = JobRepository.create_job(db, uuid.uuid4().hex, kind, params)
+        ctx = JobContext(job.id)
+        with _local_lock:
+            _local_jobs[job.id] = ctx
+        _executors[kind].submit(JobService._run, ctx, kind, params)
+        print(f"[{datetime.datetime.now()}] Queued {kind} job {job.id}")
+        return _to_out(job)
+
+    @staticmethod
+    def _run(ctx: JobContext, kind: str, params: dict):
+        db = SessionLocal()
+        try:
+            job = JobRepository.get_job(db, ctx.job_id)
+            if job.cancel_requested or ctx.cancel_event.is_set():
+                JobRepository.finish(db, ctx.job_id, "cancelled")
+                return
+            JobRepository.mark_running(db, ctx.job_id, WORKER_ID)
+            print(f"[{datetime.datetime.now()}] Running {kind} job {ctx.job_id}")
+            try:
+                result = JOB_HANDLERS[kind](ctx, db, params)
+            except JobCancelled:
+                ctx.save()
+                JobRepository.finish(db, ctx.job_id, "cancelled")
+                print(f"[{datetime.datetime.now()}] {kind} job {ctx.job_id} cancelled")
+                return
+            except Exception as e:
+                db.rollback()
+                ctx.save()
+                JobRepository.finish(db, ctx.job_id, "failed", error=str(e))
+                print(f"[{datetime.datetime.now()}] {kind} job {ctx.job_id} failed: {str(e)}")
+                return
+            ctx.save()
+            JobRepository.finish(db, ctx.job_id, "succeeded", result=result)
+            print(f"[{datetime.datetime.now()}] {kind} job {ctx.job_id} succeeded")
+        except Exception as e:
+            print(f"[{datetime.datetime.now()}] Error running {kind} job {ctx.job_id}: {str(e)}")
+        finally:
+            db.close()
+            with _local_lock:
+                _local_jobs.pop(ctx.job_id, None)
+
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[JobOut]:
+        job = JobRepository.get_job(db, job_id)
+        return _to_out(job) if job else None
+
+    @staticmethod
+    def list_jobs(db: Session) -> List[JobOut]:
+        return [_to_out(job) for job in JobRepository.list_jobs(db, JOB_LIST_LIMIT)]
+
+    @staticmethod
+    def cancel(db: Session, job_id: str) -> bool:
+        """
+        Request cancellation. A job running in another worker stops at its next
+        progress report after that worker's heartbeat picks the request up.
+        Returns False if the job doesn't exist or has already finished.
+        """
+        if not JobRepository.request_cancel(db, job_id):
+            return False
+        with _local_lock:
+            ctx = _local_jobs.get(job_id)
+        if ctx is not None:
+            ctx.cancel_event.set()
+        return True
+
+    @staticmethod
+    def maintain():
+        """
+        Refresh the heartbeat of this worker's jobs, pass on cancellation
+        requests made through other workers, and mark jobs whose worker died
+        (for example in a restart) as interrupted.
+        """
+        with _local_lock:
+            local = dict(_local_jobs)
+        db = SessionLocal()
+        try:
+            if local:
+                for job_id in JobRepository.heartbeat(db, list(local)):
+                    local[job_id].cancel_event.set()
+            stale_before = datetime.datetime.utcnow() - datetime.timedelta(seconds=JOB_STALE_AFTER)
+            interrupted = JobRepository.mark_interrupted(db, stale_before)
+            if interrupted:
+                print(f"[{datetime.datetime.now()}] Marked {interrupted} stale jobs as interrupted")
+        finally:
+            db.close()
+
+    @staticmethod
+    def shutdown():
+        """
+        Stop this worker's jobs; they are recorded as cancelled, or marked
+        interrupted by another worker if the process exits first.
+        """
+        with _local_lock:
+            local = list(_local_jobs.values())
+        for ctx in local:
+            ctx.cancel_event.set()
+        for executor in _executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
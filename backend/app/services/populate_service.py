@@ -0,0 +1,182 @@
+import io
+import time
+import datetime
+import multiprocessing
+import numpy as np
+from typing import Callable, Optional
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app.core.config import settings
+from app.core.constants import POPULATE_BATCH_SIZE
+
+# Sample titles and descriptions for variety. None of them contain tabs,
+# newlines or backslashes, so they can be written to COPY text format as is.
+TITLES = [
+    "Complete project", "Review code", "Write documentation",
+    "Test functionality", "Fix bug", "Implement feature",
+    "Attend meeting", "Send email", "Schedule call",
+    "Research solution", "Update database", "Deploy changes"
+]
+
+DESCRIPTIONS = [
+    "This needs to be done ASAP", "Low priority task", "Medium priority task",
+    "High priority task", "Follow up required", "No rush on this one",
+    "Part of the Q2 project", "Needs review from team", "Important client request",
+    "Internal improvement", "Technical debt", "Long-term project"
+]
+
+_COPY_TASKS = "COPY tasks (id, title, description, completed, expiry_date, version, created_at) FROM STDIN"
+_COPY_CHANGES = "COPY task_changes (task_id, op, task_created_at, changed_at) FROM STDIN"
+
+def _generate_batch(seed: int, batch_no: int, first_row: int, count: int, started_us: int) -> dict:
+    """
+    Generate one batch as column arrays. A batch only depends on the seed and
+    its position, so a run is reproducible whichever worker builds each batch.
+    """
+    rng = np.random.default_rng([seed, batch_no])
+    rows = first_row + np.arange(count, dtype=np.int64)
+    # One microsecond apart so the index order matches the generation order
+    created_at = (started_us + rows).astype("datetime64[us]")
+    expiry_days = rng.integers(1, 31, count).astype("timedelta64[D]")
+    return {
+        "number": rows + 1,
+        "title": rng.integers(0, len(TITLES), count),
+        "description": rng.integers(0, len(DESCRIPTIONS), count),
+        "completed": rng.random(count) > 0.7,  # 30% chance of being completed
+        "has_expiry": rng.random(count) < 0.2,  # 20% chance of having expiry date
+        "created_at": created_at,
+        "expiry_date": created_at + expiry_days
+    }
+
+def _allocate_ids(cursor, count: int) -> np.ndarray:
+    # Taken from the tasks sequence so concurrent inserts never collide
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence('tasks', 'id')) FROM generate_series(1, %s)", (count,)
+    )
+    return np.fromiter((row[0] for row in cursor.fetchall()), dtype=np.int64, count=count)
+
+def _copy_text(ids: np.ndarray, batch: dict) -> tuple[str, str]:
+    created = np.datetime_as_string(batch["created_at"], unit="us")
+    expiry = np.where(batch["has_expiry"], np.datetime_as_string(batch["expiry_date"], unit="us"), "\\N")
+    completed = np.where(batch["completed"], "t", "f")
+    changed_at = datetime.datetime.utcnow().isoformat()
+
+    ids = ids.tolist()
+    created = created.tolist()
+    tasks = "".join([
+        f"{task_id}\t{TITLES[title]} {number}\t{DESCRIPTIONS[description]}\t{is_completed}\t{expiry_date}\t1\t{created_at}\n"
+        for task_id, title, number, description, is_completed, expiry_date, created_at in zip(
+            ids, batch["title"].tolist(), batch["number"].tolist(), batch["description"].tolist(),
+            completed.tolist(), expiry.tolist(), created
+        )
+    ])
+    changes = "".join([
+        f"{task_id}\tinsert\t{created_at}\t{changed_at}\n"
+        for task_id, created_at in zip(ids, created)
+    ])
+    return tasks, changes
+
+def _load_batch(seed: int, batch_no: int, first_row: int, count: int, started_us: int, build_index: bool) -> int:
+    """
+    Generate and COPY one batch, together with its change log entries, in a
+    single transaction. Runs in a worker process.
+    """
+    from app.core import redis_utils
+    from app.core.database import engine
+
+    batch = _generate_batch(seed, batch_no, first_row, count, started_us)
+    conn = engine.raw_connection()
+    try:
+        cursor = conn.cursor()
+        ids = _allocate_ids(cursor, count)
+        tasks, changes = _copy_text(ids, batch)
+        cursor.copy_expert(_COPY_TASKS, io.StringIO(tasks))
+        cursor.copy_expert(_COPY_CHANGES, io.StringIO(changes))
+        conn.commit()
+    finally:
+        conn.close()
+
+    if build_index:
+        # Only after the commit, so the index never points at uncommitted rows.
+        # Scored the same way as rebuild_sorted_set_index scores the rows.
+        scores = dict(zip(ids.tolist(), (created_at.timestamp() for created_at in batch["created_at"].tolist())))
+        redis_utils.index_new_tasks(scores)
+    return count
+
+class PopulateService:
+    @staticmethod
+    def populate(
+        total: int,
+        seed: int | None = None,
+        workers: int = 4,
+        build_index: bool = True,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> dict:
+        """
+        Bulk load `total` generated tasks with COPY, spread over `workers`
+        processes in batches of POPULATE_BATCH_SIZE.
+
+        Each row is also logged to task_changes. With `build_index` the Redis
+        task index is extended batch by batch; otherwise (and always for the
+        packed index) it is rebuilt once at the end. Task bodies are not cached,
+        they are loaded on first read.
+
+        `on_progress(created, total)` is called after every batch. If it raises,
+        batches that haven't started are dropped and the exception propagates;
+        batches already loaded are kept and indexed.
+        """
+        from app.core import redis_utils
+        from app.core.database import SessionLocal
+        from app.services.analytics_service import AnalyticsService
+
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 63))
+        # Generated tasks are created just before the real ones that follow them
+        started_us = int(time.time() * 1e6) - total
+        # The packed index is append-only in creation order, so it is rebuilt instead
+        build_index = build_index and settings.TASK_INDEX_ENGINE != "packed"
+
+        print(f"[{datetime.datetime.now()}] Populating {total} tasks with seed {seed} on {workers} workers")
+        start_time = time.time()
+        last_log_time = start_time
+        created_count = 0
+
+        batches = [
+            (seed, batch_no, first_row, min(POPULATE_BATCH_SIZE, total - first_row), started_us, build_index)
+            for batch_no, first_row in enumerate(range(0, total, POPULATE_BATCH_SIZE))
+        ]
+        # Spawn rather than fork: the server process runs threads and an event
+        # loop, and each worker gets its own connection pool
+        context = multiprocessing.get_context("spawn")
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        try:
+            futures = [executor.submit(_load_batch, *batch) for batch in batches]
+            for future in as_completed(futures):
+                created_count += future.result()
+                if on_progress:
+                    on_progress(created_count, total)
+
+                # Log progress every 10 seconds or at the end
+                current_time = time.time()
+                if current_time - last_log_time >= 10 or created_count >= total:
+                    elapsed = current_time - start_time
+                    print(f"[{datetime.datetime.now()}] Created {created_count}/{total} tasks "
+                          f"({(created_count/total)*100:.2f}%) in {elapsed:.2f}s "
+                          f"({created_count/elapsed if elapsed > 0 else 0:.0f} tasks/sec)")
+                    last_log_time = current_time
+        finally:
+            # Only has batches left to drop when a batch failed or the load was stopped
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Loaded batches are kept either way, so bring the index and aggregates up to date
+            db = SessionLocal()
+            try:
+                if not build_index:
+                    redis_utils.rebuild_sorted_set_index(db)
+                AnalyticsService.reconcile_task_aggregates(db)
+            finally:
+                db.close()
+
+        total_time = time.time() - start_time
+
+        print(f"[{datetime.datetime.now()}] Task generation complete! Created {created_count} tasks "
+              f"in {total_time:.2f} seconds ({created_count/total_time:.0f} tasks/sec)")
+        return {"created": created_count, "seed": seed, "seconds": total_time}
@@ -1,35 +1,117 @@
+import datetime
 from typing import List, Optional
 from sqlalchemy.orm import Session
 from app.repositories.task_repository import TaskRepository
 from app.schemas.task_schema import TaskCreate, TaskUpdate, TaskOut
 from app.models.task_model import Task
-from app.core import redis_utils
-from app.core.constants import AnalyticsCounters
+from app.core import head_view, profiling, redis_utils
+from app.core.circuit_breaker import REDIS_UNAVAILABLE
+from app.core.constants import AnalyticsCounters, PAGE_SIZE, DEGRADED_PAGE_CACHE_SIZE, DEGRADED_PAGE_CACHE_TTL, HEAD_VIEW_PAGES
+from app.core.local_cache import LocalTTLCache
 from app.services.analytics_service import AnalyticsService
 
+# Pages served from Postgres while Redis is unavailable
+degraded_page_cache = LocalTTLCache(DEGRADED_PAGE_CACHE_SIZE, DEGRADED_PAGE_CACHE_TTL)
+
+def _aggregate_state(task: Task) -> dict:
+    # The version lets a reconcile tell whether its recount already saw the write
+    return {"completed": bool(task.completed), "expiry_date": task.expiry_date, "version": task.version}
+
 class TaskService:
+    @staticmethod
+    def _cache_task(task: Task, out_data: dict, is_new: bool = False):
+        degraded_page_cache.clear()
+        try:
+            with profiling.stage("redis.cache_set"):
+                redis_utils.cache_set_task(task.id, out_data, task.expiry_date, is_new=is_new)
+            with profiling.stage("redis.head_view"):
+                head_view.upsert(task.id, task.created_at.timestamp(), TaskOut(**out_data).model_dump_json())
+        except REDIS_UNAVAILABLE:
+            # The write is already committed; Redis is reconciled once it is back
+            redis_utils.mark_task_dirty(task.id)
+
     @staticmethod
     def create_task(db: Session, task_data: TaskCreate) -> TaskOut:
-        new_task = TaskRepository.create_task(db, task_data)
+        with profiling.stage("db.write"):
+            new_task = TaskRepository.create_task(db, task_data)
         out_data = TaskOut.from_orm(new_task).dict()
-        redis_utils.cache_set_task(new_task.id, out_data, new_task.expiry_date)
-        AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_CREATED)
+        TaskService._cache_task(new_task, out_data, is_new=True)
+        with profiling.stage("analytics"):
+            AnalyticsService.apply_task_change(new_task.id, None, _aggregate_state(new_task))
+            AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_CREATED)
         return TaskOut.from_orm(new_task)
     
     @staticmethod
     def get_tasks_page(db: Session, page: int) -> List[TaskOut]:
-        ordered_ids, cached_tasks, missing_ids = redis_utils.cache_get_tasks_page_with_missing(page)
+        try:
+            ordered_ids, cached_tasks, missing_ids = redis_utils.cache_get_tasks_page_with_missing(page)
+        except REDIS_UNAVAILABLE:
+            return TaskService._get_tasks_page_degraded(db, page)
 
         if missing_ids:
             missing_tasks = TaskRepository.get_tasks_by_ids(db, missing_ids)
             for task in missing_tasks:
                 out_data = TaskOut.from_orm(task).dict()
-                redis_utils.cache_set_task(task.id, out_data, task.expiry_date)
+                try:
+                    with profiling.stage("redis.cache_set"):
+                        redis_utils.cache_set_task(task.id, out_data, task.expiry_date)
+                except REDIS_UNAVAILABLE:
+                    pass
                 cached_tasks[task.id] = out_data
 
         tasks = []
-        for task_id in ordered_ids:
-            tasks.append(TaskOut(**cached_tasks[task_id]))
+        with profiling.stage("pydantic.task_out"):
+            for task_id in ordered_ids:
+                # Skip IDs still in the index whose task no longer exists
+                if task_id in cached_tasks:
+                    tasks.append(TaskOut(**cached_tasks[task_id]))
+        return tasks
+
+    @staticmethod
+    def get_head_page(db: Session, page: int) -> Optional[bytes]:
+        """
+        Get one of the first HEAD_VIEW_PAGES pages as a ready-to-send JSON
+        blob from the head view, building the view if it is missing.
+        Returns None when the caller should use get_tasks_page instead.
+        """
+        if not head_view.covers(page):
+            return None
+        try:
+            with profiling.stage("redis.head_view"):
+                blob = head_view.get_page(page)
+            if blob is None and head_view.rebuild_lock.acquire(blocking=False):
+                try:
+                    TaskService._build_head_view(db)
+                finally:
+                    head_view.rebuild_lock.release()
+                blob = head_view.get_page(page)
+        except REDIS_UNAVAILABLE:
+            return None
+        return blob
+
+    @staticmethod
+    def _build_head_view(db: Session):
+        # Assembled through the normal path so the view serves exactly what it would
+        gen = head_view.generation()
+        items = []
+        for page in range(1, HEAD_VIEW_PAGES + 2):
+            tasks = TaskService.get_tasks_page(db, page)
+            if not tasks:
+                break
+            items.extend((task.created_at.timestamp(), task.id, task.model_dump_json()) for task in tasks)
+        if not head_view.store(gen, items):
+            print(f"[{datetime.datetime.now()}] Head view changed while it was being built, discarded")
+
+    @staticmethod
+    def _get_tasks_page_degraded(db: Session, page: int) -> List[TaskOut]:
+        """
+        Serve a page straight from Postgres while Redis is unavailable.
+        """
+        tasks = degraded_page_cache.get(page)
+        if tasks is None:
+            rows = TaskRepository.get_tasks_page(db, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+            tasks = [TaskOut.from_orm(task) for task in rows]
+            degraded_page_cache.set(page, tasks)
         return tasks
 
     @staticmethod
@@ -37,10 +119,14 @@ class TaskService:
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
             return None
-        updated = TaskRepository.update_task(db, task, updates)
+        old_state = _aggregate_state(task)
+        with profiling.stage("db.write"):
+            updated = TaskRepository.update_task(db, task, updates)
         out_data = TaskOut.from_orm(updated).dict()
-        redis_utils.cache_set_task(updated.id, out_data, updated.expiry_date)
-        AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_UPDATED)
+        TaskService._cache_task(updated, out_data)
+        with profiling.stage("analytics"):
+            AnalyticsService.apply_task_change(updated.id, old_state, _aggregate_state(updated))
+            AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_UPDATED)
         return TaskOut(**out_data)
 
     @staticmethod
@@ -48,7 +134,19 @@ class TaskService:
         task = db.query(Task).filter(Task.id == task_id).first()
         if not task:
             return False
-        TaskRepository.delete_task(db, task)
-        redis_utils.cache_delete_task(task_id)
-        AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_DELETED)
+        created_at = task.created_at
+        old_state = _aggregate_state(task)
+        with profiling.stage("db.write"):
+            TaskRepository.delete_task(db, task)
+        degraded_page_cache.clear()
+        try:
+            with profiling.stage("redis.cache_delete"):
+                redis_utils.cache_delete_task(task_id, created_at)
+            with profiling.stage("redis.head_view"):
+                head_view.delete(task_id)
+        except REDIS_UNAVAILABLE:
+            redis_utils.mark_task_dirty(task_id, deleted=True)
+        with profiling.stage("analytics"):
+            AnalyticsService.apply_task_change(task_id, old_state, None)
+            AnalyticsService.increment_counter(db, AnalyticsCounters.TASKS_DELETED)
         return True
@@ -0,0 +1,77 @@
+import os
+import sys
+import time
+import random
+import argparse
+import datetime
+
+# Benchmark against a dedicated Redis database so the real index is left alone
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6380")
+os.environ.setdefault("REDIS_DB", "15")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend"))
+
+from app.core import packed_index  # noqa: E402
+from app.core.constants import PAGE_SIZE  # noqa: E402
+from app.core.redis_clients import redis_client  # noqa: E402
+
+ZSET_KEY = "tasks_sorted"
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def build_entries(count):
+    start = datetime.datetime(2024, 1, 1)
+    return [(task_id, start + datetime.timedelta(seconds=task_id)) for task_id in range(1, count + 1)]
+
+def build_zset(entries, chunk=10000):
+    redis_client.delete(ZSET_KEY)
+    for offset in range(0, len(entries), chunk):
+        redis_client.zadd(ZSET_KEY, {task_id: created_at.timestamp() for task_id, created_at in entries[offset:offset + chunk]})
+
+def time_pages(read_page, pages, samples):
+    timings = []
+    for _ in range(samples):
+        page = random.randint(1, pages)
+        start = time.perf_counter()
+        read_page((page - 1) * PAGE_SIZE)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def report(name, memory, timings):
+    print(f"{name:<8} memory={memory / 1024 / 1024:8.2f}MB "
+          f"p50={percentile(timings, 50):.3f}ms p99={percentile(timings, 99):.3f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the tasks_sorted ZSET with the packed page index")
+    parser.add_argument("--tasks", type=int, default=1000000)
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--delete-ratio", type=float, default=0.0,
+                        help="Fraction of tasks to tombstone before timing the packed index")
+    args = parser.parse_args()
+
+    print(f"Building indexes with {args.tasks} tasks in Redis db {os.environ['REDIS_DB']}...")
+    entries = build_entries(args.tasks)
+    build_zset(entries)
+    packed_index.rebuild(entries)
+
+    deleted = random.sample(entries, int(args.tasks * args.delete_ratio))
+    for task_id, created_at in deleted:
+        redis_client.zrem(ZSET_KEY, task_id)
+        packed_index.tombstone(task_id, created_at)
+
+    pages = (args.tasks - len(deleted)) // PAGE_SIZE
+    report("zset", redis_client.memory_usage(ZSET_KEY) or 0,
+           time_pages(lambda start: redis_client.zrevrange(ZSET_KEY, start, start + PAGE_SIZE - 1), pages, args.samples))
+    report("packed", packed_index.memory_usage(),
+           time_pages(lambda start: packed_index.get_page_ids(start, PAGE_SIZE), pages, args.samples))
+
+    if deleted:
+        print(f"Compacting {len(deleted)} tombstones...")
+        packed_index.compact_blocks()
+        report("compact", packed_index.memory_usage(),
+               time_pages(lambda start: packed_index.get_page_ids(start, PAGE_SIZE), pages, args.samples))
+
+if __name__ == "__main__":
+    main()
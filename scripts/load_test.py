@@ -0,0 +1,40 @@
+import time
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def timed_request(session, method, url):
+    start = time.perf_counter()
+    try:
+        status = session.request(method, url, timeout=30).status_code
+    except requests.RequestException as e:
+        status = type(e).__name__
+    return status, (time.perf_counter() - start) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Fire concurrent requests at the backend and report latency percentiles")
+    parser.add_argument("--url", default="http://localhost:8002/tasks/1")
+    parser.add_argument("--method", default="GET")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    session = requests.Session()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda _: timed_request(session, args.method, args.url), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    timings = [latency for _, latency in results]
+    statuses = Counter(status for status, _ in results)
+    print(f"{args.requests} requests in {elapsed:.2f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"p50={percentile(timings, 50):.1f}ms p99={percentile(timings, 99):.1f}ms max={max(timings):.1f}ms")
+    print(f"statuses: {dict(statuses)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+#!/bin/sh
+# Start N local Redis processes for trying out REDIS_SHARDS.
+#
+#   ./start_redis_shards.sh 3          # ports 7001-7003
+#   ./start_redis_shards.sh 3 stop
+set -e
+
+COUNT=${1:-3}
+BASE_PORT=${BASE_PORT:-7000}
+SHARDS=""
+
+for i in $(seq 1 "$COUNT"); do
+    PORT=$((BASE_PORT + i))
+    if [ "$2" = "stop" ]; then
+        redis-cli -p "$PORT" shutdown nosave || true
+        continue
+    fi
+    redis-server --port "$PORT" --save "" --appendonly no --daemonize yes \
+        --maxmemory 256mb --maxmemory-policy allkeys-lfu
+    SHARDS="${SHARDS:+$SHARDS,}localhost:$PORT"
+done
+
+if [ "$2" != "stop" ]; then
+    echo "Started $COUNT Redis shards. Run the backend with:"
+    echo "  REDIS_SHARDS=$SHARDS TASK_INDEX_ENGINE=bucketed uvicorn app.main:app --port 8002"
+fi